@@ -1,44 +1,144 @@
-from eca import OneDimensionalElementaryCellularAutomata
-from numpy import ndarray, uint8
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from multiprocessing import get_context
+from os import environ
+from time import sleep
+from typing import Any, Callable, Union
+
+from numpy import asarray, ndarray, uint8
+from numpy.random import default_rng
 from PIL import Image
-from streamlit import cache_data, image, number_input, set_page_config, slider, tabs
+from streamlit import (
+    cache_resource,
+    empty,
+    image,
+    number_input,
+    session_state,
+    set_page_config,
+    slider,
+    tabs,
+)
+from streamlit.delta_generator import DeltaGenerator
 
-from domain_filters.contours_via_circles import detect_contours
-from domain_filters.lftsf import LocalisedFourierTransformSelfFilter
+from domain_filters.automata import spacetime as elementary_spacetime
+from domain_filters.contours_via_circles import threshold_contours
+from domain_filters.result_cache import ResultCache, result_key
+from domain_filters.tiling import FilterJob, submit_tiled
 
+RESULT_CACHE_BYTES = 2**28
+PREVIEW_INTERVAL = 0.1
 
-@cache_data
-def get_spacetime(width: int, height: int, rule: int) -> ndarray:
-    ca = OneDimensionalElementaryCellularAutomata(lattice_width=width)
-    for _ in range(height):
-        ca.transition(rule_number=rule)
-    return ca.evolution()
 
+@cache_resource
+def get_result_cache() -> ResultCache:
+    """One bounded cache per server process, shared by every session (set DOMAIN_FILTERS_RESULT_CACHE to also keep results on disk)"""
+    return ResultCache(
+        max_bytes=RESULT_CACHE_BYTES,
+        directory=environ.get("DOMAIN_FILTERS_RESULT_CACHE"),
+    )
 
-@cache_data
-def display_spacetime_as_image(spacetime: ndarray) -> None:
-    image(Image.fromarray(uint8(spacetime) * 255))
 
+def get_spacetime(width: int, height: int, rule: int, seed: int) -> ndarray:
+    """The rule's spacetime from the seed's random initial configuration"""
+    return get_result_cache().get_or_compute(
+        key=result_key(
+            rule=rule, width=width, height=height, name="spacetime", seed=seed
+        ),
+        compute=lambda: elementary_spacetime(
+            width=width, n_steps=height, rule_number=rule, rng=default_rng(seed)
+        ),
+    )
 
-@cache_data
-def display_filtered_spacetime_simple(
-    spacetime: ndarray, radius: int, difference_threshold: float
-) -> None:
-    filtered_spacetime = detect_contours(
-        image=spacetime, neighbourhood_radius=radius, threshold=difference_threshold
+
+@cache_resource
+def get_executor() -> ProcessPoolExecutor:
+    """One worker pool per server process, shared by every session"""
+    return ProcessPoolExecutor(mp_context=get_context("spawn"))
+
+
+def submit_filter(
+    job_slot: str,
+    width: int,
+    height: int,
+    rule: int,
+    seed: int,
+    name: str,
+    **parameters: Any,
+) -> tuple[str, str, Union[ndarray, FilterJob]]:
+    """The cached result, or a job filtering in the background (cancelling this session's superseded job in the same slot)"""
+    key = result_key(
+        rule=rule, width=width, height=height, name=name, seed=seed, **parameters
     )
-    display_spacetime_as_image(spacetime=filtered_spacetime)
+    previous_key, previous_job = session_state.pop(job_slot, (None, None))
+    if previous_key == key and not previous_job.done():
+        session_state[job_slot] = (key, previous_job)
+        return job_slot, key, previous_job
+    if previous_key != key and previous_job is not None:
+        previous_job.cancel()
+    filtered_spacetime = get_result_cache().get(key=key)
+    if filtered_spacetime is not None:
+        return job_slot, key, filtered_spacetime
+    if previous_key == key:
+        return job_slot, key, get_result_cache().put(
+            key=key, result=previous_job.result()
+        )
+    job = submit_tiled(
+        name,
+        get_spacetime(width=width, height=height, rule=rule, seed=seed),
+        get_executor(),
+        **parameters,
+    )
+    session_state[job_slot] = (key, job)
+    return job_slot, key, job
 
 
-@cache_data
-def display_filtered_spacetime_fourier(
-    spacetime: ndarray, binarisation_threshold: float, localisation: int
+def display_progressively(
+    requests: list[
+        tuple[
+            DeltaGenerator,
+            str,
+            str,
+            Union[ndarray, FilterJob],
+            Callable[[ndarray], ndarray],
+        ]
+    ],
 ) -> None:
-    lftsf_domain_filter = LocalisedFourierTransformSelfFilter(
-        localisation_size=localisation, binarisation_threshold=binarisation_threshold
-    )
-    filtered_spacetime = lftsf_domain_filter.classify_spacetime(spacetime=spacetime)
-    display_spacetime_as_image(spacetime=filtered_spacetime)
+    """Show the row bands of every job as they finish, then the whole result"""
+    pending = list(requests)
+    while pending:
+        for request in list(pending):
+            placeholder, job_slot, key, job, postprocess = request
+            if not isinstance(job, FilterJob) or job.done():
+                filtered_spacetime = job
+                if isinstance(job, FilterJob):
+                    filtered_spacetime = get_result_cache().put(
+                        key=key, result=job.result()
+                    )
+                    session_state.pop(job_slot, None)
+                placeholder.image(
+                    spacetime_as_image(spacetime=postprocess(filtered_spacetime))
+                )
+                pending.remove(request)
+                continue
+            finished_rows = job.finished_rows
+            preview = job.preview()
+            if preview is not None:
+                placeholder.image(
+                    spacetime_as_image(
+                        spacetime=postprocess(preview) * finished_rows[:, None]
+                    ),
+                    caption=f"{job.progress:.0%}",
+                )
+        if pending:
+            sleep(PREVIEW_INTERVAL)
+
+
+def spacetime_as_image(spacetime: ndarray) -> Image.Image:
+    return Image.fromarray(uint8(spacetime) * 255)
+
+
+def display_spacetime_as_image(spacetime: ndarray) -> None:
+    image(spacetime_as_image(spacetime=spacetime))
 
 
 set_page_config(
@@ -52,22 +152,45 @@ original_tab, simple_tab, fourier_tab = tabs(
 
 width = slider("Width", 10, 1000, 300)
 height = slider("Height", 10, 1000, 300)
-rule = number_input("Rule", 0, 258, 110)
-spacetime = get_spacetime(width=width, height=height, rule=rule)
+rule = number_input("Rule", 0, 255, 110)
+seed = number_input("Seed", 0, 2**32 - 1, 0)
 
 with original_tab:
-    display_spacetime_as_image(spacetime=spacetime)
+    display_spacetime_as_image(
+        spacetime=get_spacetime(width=width, height=height, rule=rule, seed=seed)
+    )
 with simple_tab:
     radius = slider("Max Radius", 2, width // 2, 4)
     threshold = slider("Max Difference", 0.0, 1.0, 0.2)
-    display_filtered_spacetime_simple(
-        spacetime=spacetime, radius=radius, difference_threshold=threshold
+    contours_request = (
+        empty(),
+        *submit_filter(
+            "contours_job",
+            width=width,
+            height=height,
+            rule=rule,
+            seed=seed,
+            name="contours_gradient",
+            neighbourhood_radius=radius,
+            dtype="float64",
+        ),
+        partial(threshold_contours, threshold=threshold, dtype="uint8"),
     )
 with fourier_tab:
     binarisation_threshold = slider("Binarisation Threshold", 0.0, 1.0, 0.5)
     localisation = slider("Submatrix Size", 2, width // 2, 4)
-    display_filtered_spacetime_fourier(
-        spacetime=spacetime,
-        binarisation_threshold=binarisation_threshold,
-        localisation=localisation,
+    lftsf_request = (
+        empty(),
+        *submit_filter(
+            "lftsf_job",
+            width=width,
+            height=height,
+            rule=rule,
+            seed=seed,
+            name="lftsf",
+            localisation_size=localisation,
+            binarisation_threshold=binarisation_threshold,
+        ),
+        asarray,
     )
+display_progressively(requests=[contours_request, lftsf_request])
@@ -0,0 +1,139 @@
+from argparse import ArgumentParser
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import product
+from json import loads
+from os import cpu_count
+from time import perf_counter
+from typing import Any, Iterator, NamedTuple, Optional
+
+from numpy import ndarray
+from numpy.random import default_rng
+
+from benchmark import DEFAULT_FILTERS, parse_size
+from domain_filters import run_filter
+from domain_filters.automata import spacetime as elementary_spacetime
+from domain_filters.result_cache import ResultCache, result_key
+
+DEFAULT_STORE = "atlas"
+N_RULES = 256
+
+
+class AtlasJob(NamedTuple):
+    rule: int
+    height: int
+    width: int
+    seed: int
+    name: str
+    parameters: dict[str, Any]
+
+    @property
+    def key(self) -> str:
+        return result_key(
+            rule=self.rule,
+            width=self.width,
+            height=self.height,
+            name=self.name,
+            seed=self.seed,
+            **self.parameters,
+        )
+
+
+def open_store(path: str) -> ResultCache:
+    """The on-disk atlas (nothing is held in memory, every mask is compressed)"""
+    return ResultCache(max_bytes=0, directory=path, compressed=True)
+
+
+def atlas_jobs(
+    rules: list[int],
+    sizes: list[tuple[int, int]],
+    seeds: list[int],
+    filter_parameters: dict[str, list[dict[str, Any]]],
+) -> Iterator[AtlasJob]:
+    for (height, width), seed, rule in product(sizes, seeds, rules):
+        for name, parameter_sets in filter_parameters.items():
+            for parameters in parameter_sets:
+                yield AtlasJob(rule, height, width, seed, name, parameters)
+
+
+def run_job(store_path: str, job: AtlasJob) -> dict[str, Any]:
+    """Filter the job's spacetime and store the mask with how long the filter took"""
+    spacetime = elementary_spacetime(
+        width=job.width,
+        n_steps=job.height,
+        rule_number=job.rule,
+        rng=default_rng(job.seed),
+    )
+    started = perf_counter()
+    mask = run_filter(job.name, spacetime, **job.parameters)
+    wall_time = perf_counter() - started
+    open_store(path=store_path).put(
+        key=job.key, result=mask, wall_time=wall_time, **job._asdict()
+    )
+    return {"wall_time": wall_time, **job._asdict()}
+
+
+def sweep(
+    store_path: str,
+    jobs: list[AtlasJob],
+    n_workers: Optional[int] = None,
+) -> Iterator[dict[str, Any]]:
+    """Run every job not already in the store on a process pool, yielding each one's record as it finishes (interrupting loses at most the running jobs)"""
+    store = open_store(path=store_path)
+    remaining = [job for job in jobs if job.key not in store]
+    n_workers = n_workers or cpu_count()
+    with ProcessPoolExecutor(max_workers=n_workers) as pool:
+        pending = set()
+        for job in remaining:
+            if len(pending) >= 2 * n_workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+            pending.add(pool.submit(run_job, store_path, job))
+        for future in pending:
+            yield future.result()
+
+
+def load_mask(store_path: str, job: AtlasJob) -> Optional[ndarray]:
+    return open_store(path=store_path).get(key=job.key)
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--store", type=str, default=DEFAULT_STORE)
+    parser.add_argument("--rules", type=int, nargs="+", default=range(N_RULES))
+    parser.add_argument(
+        "--sizes",
+        type=parse_size,
+        nargs="+",
+        default=[(100, 100), (200, 200)],
+        help="HEIGHTxWIDTH",
+    )
+    parser.add_argument("--seeds", type=int, nargs="+", default=[0])
+    parser.add_argument("--filters", type=str, nargs="+", default=DEFAULT_FILTERS)
+    parser.add_argument(
+        "--parameters",
+        type=loads,
+        default={},
+        help='JSON of the parameter sets to sweep per filter, e.g. {"lftsf": [{"localisation_size": 4}, {"localisation_size": 6}]}',
+    )
+    parser.add_argument("--n_workers", type=int, default=None)
+    arguments = parser.parse_args()
+
+    jobs = list(
+        atlas_jobs(
+            rules=list(arguments.rules),
+            sizes=arguments.sizes,
+            seeds=arguments.seeds,
+            filter_parameters={
+                name: arguments.parameters.get(name, [{}]) for name in arguments.filters
+            },
+        )
+    )
+    for n_done, record in enumerate(
+        sweep(store_path=arguments.store, jobs=jobs, n_workers=arguments.n_workers),
+        start=1,
+    ):
+        print(
+            f"{n_done}\trule {record['rule']}\t{record['height']}x{record['width']}\t"
+            f"seed {record['seed']}\t{record['name']}\t{record['wall_time']:.4f}s"
+        )
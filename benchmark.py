@@ -0,0 +1,159 @@
+from argparse import ArgumentParser
+from csv import DictWriter
+from glob import glob
+from json import dump
+from pathlib import Path
+from time import perf_counter
+from tracemalloc import get_traced_memory, start, stop
+from typing import Any, Optional
+
+from numpy import asarray, ndarray
+
+from domain_filters import run_filter
+from domain_filters.automata import spacetime as elementary_spacetime
+from metric import get_score
+from samples import load_sample
+
+DEFAULT_FILTERS = (
+    "simple",
+    "lftsf",
+    "contours",
+    "local_ncd",
+    "local_ncd2",
+    "frequency",
+)
+DEFAULT_SIZES = ((100, 100), (200, 200), (400, 400))
+DEFAULT_RULES = (30, 54, 110)
+RESULT_FIELDS = (
+    "source",
+    "rule",
+    "filter",
+    "height",
+    "width",
+    "wall_time",
+    "peak_memory",
+    "cells_per_second",
+    "score",
+)
+
+
+def eca_spacetime(width: int, height: int, rule: int) -> ndarray:
+    return elementary_spacetime(width=width, n_steps=height, rule_number=rule)
+
+
+def measure(
+    name: str,
+    spacetime: ndarray,
+    expected: Optional[ndarray] = None,
+    repeats: int = 3,
+    **parameters: Any,
+) -> dict[str, Any]:
+    """Best wall time over the repeats, peak traced memory of one more run, throughput and (given the expected domains) score of the named filter"""
+    wall_time = float("inf")
+    for _ in range(repeats):
+        started = perf_counter()
+        prediction = run_filter(name, spacetime, **parameters)
+        wall_time = min(wall_time, perf_counter() - started)
+    start()
+    try:
+        run_filter(name, spacetime, **parameters)
+        _, peak_memory = get_traced_memory()
+    finally:
+        stop()
+    height, width = spacetime.shape
+    return {
+        "filter": name,
+        "height": height,
+        "width": width,
+        "wall_time": wall_time,
+        "peak_memory": peak_memory,
+        "cells_per_second": height * width / wall_time if wall_time else float("inf"),
+        "score": (
+            float("nan")
+            if expected is None
+            else get_score(predicted=asarray(prediction), expected=expected)
+        ),
+    }
+
+
+def benchmark_samples(
+    paths: list[str], filters: list[str], repeats: int = 3
+) -> list[dict[str, Any]]:
+    results = []
+    for path in paths:
+        spacetime, expected = load_sample(path=path)
+        for name in filters:
+            result = measure(
+                name=name, spacetime=spacetime, expected=expected, repeats=repeats
+            )
+            results.append({"source": path, "rule": None, **result})
+    return results
+
+
+def benchmark_synthetic(
+    sizes: list[tuple[int, int]],
+    rules: list[int],
+    filters: list[str],
+    repeats: int = 3,
+) -> list[dict[str, Any]]:
+    """Benchmark every filter on elementary cellular automata of every rule and (height, width) (these have no expected domains, so no score)"""
+    results = []
+    for height, width in sizes:
+        for rule in rules:
+            spacetime = eca_spacetime(width=width, height=height, rule=rule)
+            for name in filters:
+                result = measure(name=name, spacetime=spacetime, repeats=repeats)
+                results.append({"source": "eca", "rule": rule, **result})
+    return results
+
+
+def write_results(results: list[dict[str, Any]], path: str) -> None:
+    """Write the results as CSV if the path ends in .csv, otherwise as JSON"""
+    with open(path, "w", newline="") as output_file:
+        if Path(path).suffix == ".csv":
+            writer = DictWriter(output_file, fieldnames=RESULT_FIELDS)
+            writer.writeheader()
+            writer.writerows(results)
+        else:
+            dump(results, output_file, indent=2)
+
+
+def parse_size(size: str) -> tuple[int, int]:
+    height, width = size.lower().split("x")
+    return int(height), int(width)
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--samples", type=str, default="test_samples/*.json")
+    parser.add_argument("--filters", type=str, nargs="+", default=DEFAULT_FILTERS)
+    parser.add_argument(
+        "--sizes",
+        type=parse_size,
+        nargs="*",
+        default=DEFAULT_SIZES,
+        help="HEIGHTxWIDTH",
+    )
+    parser.add_argument("--rules", type=int, nargs="*", default=DEFAULT_RULES)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--output", type=str, nargs="+", default=["benchmark.json"])
+    arguments = parser.parse_args()
+
+    results = benchmark_samples(
+        paths=sorted(glob(arguments.samples)),
+        filters=arguments.filters,
+        repeats=arguments.repeats,
+    ) + benchmark_synthetic(
+        sizes=arguments.sizes,
+        rules=arguments.rules,
+        filters=arguments.filters,
+        repeats=arguments.repeats,
+    )
+    for result in results:
+        print(
+            f"{result['source']}\t{result['rule']}\t{result['height']}x{result['width']}\t{result['filter']}\t"
+            f"{result['wall_time']:.4f}s\t{result['peak_memory'] / 2**20:.1f}MiB\t"
+            f"{result['cells_per_second']:.0f} cells/s\tscore={result['score']:.4f}"
+        )
+    for path in arguments.output:
+        write_results(results=results, path=path)
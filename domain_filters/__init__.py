@@ -0,0 +1,116 @@
+"""Registry of domain filters, each imported only on first use"""
+
+from importlib import import_module
+from typing import Any, Callable, NamedTuple, Optional
+
+
+class FilterSpec(NamedTuple):
+    module: str
+    attribute: str
+    spacetime_argument: str = "spacetime"
+    footprint_parameter: Optional[str] = None
+    footprint_offset: int = 0
+    periodic: bool = False
+    tileable: bool = True
+    causal: bool = False
+    vertical_footprint: Optional[int] = None
+
+
+FILTERS: dict[str, FilterSpec] = {
+    "simple": FilterSpec(
+        "domain_filters.simple",
+        "SimpleDomainFilter",
+        footprint_parameter="max_radius",
+        periodic=True,
+        causal=True,
+        vertical_footprint=0,
+    ),
+    "lftsf": FilterSpec(
+        "domain_filters.lftsf",
+        "LocalisedFourierTransformSelfFilter",
+        footprint_parameter="localisation_size",
+    ),
+    "contours": FilterSpec(
+        "domain_filters.contours_via_circles",
+        "detect_contours",
+        "image",
+        footprint_parameter="neighbourhood_radius",
+    ),
+    "contours_gradient": FilterSpec(
+        "domain_filters.contours_via_circles",
+        "semicircle_difference_field",
+        "image",
+        footprint_parameter="neighbourhood_radius",
+    ),
+    "local_ncd": FilterSpec(
+        "domain_filters.local_ncd_filter",
+        "local_ncd",
+        footprint_parameter="neighbourhood_radius",
+        footprint_offset=3,
+        causal=True,
+    ),
+    "local_ncd2": FilterSpec(
+        "domain_filters.local_ncd_filter",
+        "local_ncd2",
+        footprint_parameter="neighbourhood_radius",
+        causal=True,
+    ),
+    "frequency": FilterSpec(
+        "domain_filters.others.frequency_filter",
+        "filter_by_lookup_frequency",
+        "spacetime_evolution",
+        tileable=False,
+    ),
+    "statistical_complexity": FilterSpec(
+        "domain_filters.others.local_statistical_complexity_filter",
+        "local_statistical_complexity_filter",
+        footprint_parameter="lightcone_depth",
+        periodic=True,
+        causal=True,
+    ),
+}
+
+_LAZY_ATTRIBUTES = {
+    "SimpleDomainFilter": "domain_filters.simple",
+    "LocalisedFourierTransformSelfFilter": "domain_filters.lftsf",
+    "detect_contours": "domain_filters.contours_via_circles",
+    "gradient_field": "domain_filters.contours_via_circles",
+    "threshold_contours": "domain_filters.contours_via_circles",
+    "local_ncd": "domain_filters.local_ncd_filter",
+    "local_ncd2": "domain_filters.local_ncd_filter",
+    "PackedSpacetime": "domain_filters.packed_spacetime",
+    "ResultCache": "domain_filters.result_cache",
+}
+
+
+def register_filter(name: str, module: str, attribute: str, **spec: Any) -> None:
+    FILTERS[name] = FilterSpec(module, attribute, **spec)
+
+
+def available_filters() -> list[str]:
+    return list(FILTERS)
+
+
+def get_filter(name: str) -> Callable[..., Any]:
+    """Import the named filter and wrap it as filter(spacetime, **parameters)"""
+    if name not in FILTERS:
+        raise KeyError(f"unknown filter {name}, expected one of {available_filters()}")
+    spec = FILTERS[name]
+    implementation = getattr(import_module(spec.module), spec.attribute)
+    if isinstance(implementation, type):
+        return lambda spacetime, **parameters: implementation(
+            **parameters
+        ).classify_spacetime(spacetime=spacetime)
+    return lambda spacetime, **parameters: implementation(
+        **{spec.spacetime_argument: spacetime}, **parameters
+    )
+
+
+def run_filter(name: str, spacetime: Any, **parameters: Any) -> Any:
+    return get_filter(name=name)(spacetime, **parameters)
+
+
+def __getattr__(name: str) -> Any:
+    if name in _LAZY_ATTRIBUTES:
+        return getattr(import_module(_LAZY_ATTRIBUTES[name]), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
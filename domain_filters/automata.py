@@ -0,0 +1,123 @@
+from typing import Iterator, Optional, Sequence, Union
+
+from numpy import (
+    arange,
+    asarray,
+    empty,
+    frombuffer,
+    intp,
+    left_shift,
+    ndarray,
+    uint8,
+)
+from numpy.random import Generator, default_rng
+
+from domain_filters.packed_spacetime import PackedSpacetime
+
+N_NEIGHBOURHOODS = 8
+
+Configuration = Union[int, str, Sequence[int], ndarray]
+
+
+def rule_table(rule_number: int) -> ndarray:
+    """Next state of a cell for every neighbourhood, indexed by left*4 + centre*2 + right"""
+    if not 0 <= rule_number < 2**N_NEIGHBOURHOODS:
+        raise ValueError(f"rule {rule_number} is not an elementary rule (0 to 255)")
+    return ((rule_number >> arange(N_NEIGHBOURHOODS)) & 1).astype(uint8)
+
+
+def initial_configuration(
+    width: int,
+    configuration: Optional[Configuration] = None,
+    rng: Optional[Generator] = None,
+) -> ndarray:
+    """A row of cells from an integer (most significant bit leftmost), a string or sequence of 0s and 1s, or at random when None"""
+    if configuration is None:
+        return (rng or default_rng()).integers(0, 2, width, dtype=uint8)
+    if isinstance(configuration, int):
+        if not 0 <= configuration < 2**width:
+            raise ValueError(f"{configuration} does not fit in {width} cells")
+        return asarray(list(format(configuration, f"0{width}b")), dtype=uint8)
+    if isinstance(configuration, str):
+        configuration = frombuffer(configuration.encode("utf-8"), dtype=uint8) - ord(
+            "0"
+        )
+    configuration = asarray(configuration)
+    if not ((configuration == 0) | (configuration == 1)).all():
+        raise ValueError("a configuration can only hold 0s and 1s")
+    return configuration.astype(uint8)
+
+
+def step(configurations: ndarray, tables: ndarray, out: ndarray) -> ndarray:
+    """Apply each row's rule table to its (periodic) neighbourhoods, writing the next configurations into out"""
+    n_configurations, width = configurations.shape
+    neighbourhoods = left_shift(configurations, 1, dtype=intp)
+    neighbourhoods[:, 1:] += configurations[:, :-1] << 2
+    neighbourhoods[:, 0] += configurations[:, -1] << 2
+    neighbourhoods[:, :-1] += configurations[:, 1:]
+    neighbourhoods[:, -1] += configurations[:, 0]
+    neighbourhoods += (N_NEIGHBOURHOODS * arange(n_configurations))[:, None]
+    return tables.take(neighbourhoods, out=out)
+
+
+def evolve(
+    rule_numbers: Sequence[int],
+    initial_configurations: ndarray,
+    n_steps: int,
+    out: Optional[ndarray] = None,
+) -> ndarray:
+    """Evolve a batch of configurations (one rule each) together into a (batch, n_steps + 1, width) array"""
+    initial_configurations = asarray(initial_configurations, dtype=uint8)
+    n_configurations, width = initial_configurations.shape
+    if len(rule_numbers) != n_configurations:
+        raise ValueError(
+            f"{len(rule_numbers)} rules for {n_configurations} initial configurations"
+        )
+    tables = asarray([rule_table(rule_number) for rule_number in rule_numbers])
+    if out is None:
+        out = empty((n_configurations, n_steps + 1, width), dtype=uint8)
+    out[:, 0] = initial_configurations
+    for t in range(n_steps):
+        step(configurations=out[:, t], tables=tables, out=out[:, t + 1])
+    return out
+
+
+def spacetime(
+    width: int,
+    n_steps: int,
+    rule_number: int,
+    configuration: Optional[Configuration] = None,
+    packed: bool = False,
+    rng: Optional[Generator] = None,
+) -> Union[ndarray, PackedSpacetime]:
+    """The initial configuration followed by n_steps transitions of one rule (the same spacetime as OneDimensionalElementaryCellularAutomata.evolution)"""
+    evolution = evolve(
+        rule_numbers=[rule_number],
+        initial_configurations=initial_configuration(
+            width=width, configuration=configuration, rng=rng
+        )[None],
+        n_steps=n_steps,
+    )[0]
+    if packed:
+        return PackedSpacetime.from_dense(evolution)
+    return evolution
+
+
+def evolution_rows(
+    rule_number: int,
+    configuration: ndarray,
+    n_steps: Optional[int] = None,
+) -> Iterator[ndarray]:
+    """Yield the configuration after every transition (forever when n_steps is None)"""
+    tables = rule_table(rule_number)[None]
+    configuration = asarray(configuration, dtype=uint8)[None]
+    yield configuration[0]
+    t = 0
+    while n_steps is None or t < n_steps:
+        configuration = step(
+            configurations=configuration,
+            tables=tables,
+            out=empty(configuration.shape, dtype=uint8),
+        )
+        yield configuration[0]
+        t += 1
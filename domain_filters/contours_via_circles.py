@@ -1,6 +1,33 @@
+from collections import OrderedDict
+from functools import lru_cache
+from hashlib import sha256
 from math import pi
+from typing import Iterator, Sequence
 
-from numpy import arctan2, mean, ndarray, zeros_like
+from numpy import (
+    arange,
+    arctan2,
+    asarray,
+    ascontiguousarray,
+    full,
+    maximum,
+    mean,
+    ndarray,
+    ones,
+    pad,
+    where,
+    zeros,
+)
+
+SPLIT_ORIENTATIONS = {
+    "orientation of split: horizontal": [0, 1, 2, 3],
+    "orientation of split: diagonal left": [1, 2, 3, 4],
+    "orientation of split: vertical": [2, 3, 4, 5],
+    "orientation of split: diagonal right": [3, 4, 5, 6],
+}
+N_SEGMENT_LABELS = 9
+MAX_CACHED_GRADIENT_BYTES = 2**27
+_gradient_fields: OrderedDict[tuple, ndarray] = OrderedDict()
 
 
 def pairwise_combinations(r: int) -> list[tuple[int, int]]:
@@ -84,12 +111,7 @@ def gradients_between_circle_halves(
             ],
             image=image,
         )
-        for selected_labels in {
-            "orientation of split: horizontal": [0, 1, 2, 3],
-            "orientation of split: diagonal left": [1, 2, 3, 4],
-            "orientation of split: vertical": [2, 3, 4, 5],
-            "orientation of split: diagonal right": [3, 4, 5, 6],
-        }.values()
+        for selected_labels in SPLIT_ORIENTATIONS.values()
     ]
 
 
@@ -113,18 +135,135 @@ def is_contour(
     return difference < difference_threshold
 
 
+@lru_cache(maxsize=None)
+def segment_kernels(radius: int) -> ndarray:
+    """Label every offset of the circle (of the given radius) with its segment number, once per radius (-1 outside the circle)"""
+    offsets = [
+        (dX, dY) for r in range(radius + 1) for dX, dY in pairwise_combinations(r=r)
+    ]
+    labels = label_coordinates_by_segment_number(coordinates=offsets)
+    kernels = full((2 * radius + 1, 2 * radius + 1), -1)
+    for (dX, dY), label in zip(offsets, labels):
+        kernels[radius + dY, radius + dX] = label
+    kernels.flags.writeable = False
+    return kernels
+
+
+def segment_sums(image: ndarray, radius: int) -> tuple[ndarray, ndarray]:
+    """Sum (and count) the in-bounds pixel values falling in each segment of the circle around every pixel at once"""
+    ((_, sums, counts),) = _growing_segment_sums(image=image, radii=[radius])
+    return sums, counts
+
+
+def _growing_segment_sums(
+    image: ndarray, radii: list[int]
+) -> Iterator[tuple[int, ndarray, ndarray]]:
+    """Yield the segment sums and counts for each of the sorted radii, growing the circle one ring at a time"""
+    max_radius = radii[-1]
+    kernels = segment_kernels(radius=max_radius)
+    offsets = arange(-max_radius, max_radius + 1)
+    ring_distances = abs(offsets)[:, None] + abs(offsets)[None, :]
+    height, width = image.shape
+    padded_image = pad(image.astype("float64"), max_radius)
+    padded_mask = pad(ones(image.shape), max_radius)
+    sums = zeros((N_SEGMENT_LABELS, height, width))
+    counts = zeros((N_SEGMENT_LABELS, height, width))
+    for radius in range(max_radius + 1):
+        for row, column in zip(*where(ring_distances == radius)):
+            label = kernels[row, column]
+            sums[label] += padded_image[row : row + height, column : column + width]
+            counts[label] += padded_mask[row : row + height, column : column + width]
+        if radius in radii:
+            yield radius, sums, counts
+
+
+def _max_semicircle_difference_from_sums(sums: ndarray, counts: ndarray) -> ndarray:
+    total_sum, total_count = sums.sum(axis=0), counts.sum(axis=0)
+    differences = zeros(sums.shape[1:])
+    for selected_labels in SPLIT_ORIENTATIONS.values():
+        sum1, count1 = sums[selected_labels].sum(axis=0), counts[selected_labels].sum(
+            axis=0
+        )
+        sum2, count2 = total_sum - sum1, total_count - count1
+        both_halves = (count1 > 0) & (count2 > 0)
+        difference = abs(
+            sum1 / where(both_halves, count1, 1) - sum2 / where(both_halves, count2, 1)
+        )
+        differences = maximum(differences, where(both_halves, difference, 0.0))
+    return differences
+
+
+def max_semicircle_difference(image: ndarray, radius: int) -> ndarray:
+    """The maximum difference between two circle halves around every pixel of the image"""
+    sums, counts = segment_sums(image=image, radius=radius)
+    return _max_semicircle_difference_from_sums(sums=sums, counts=counts)
+
+
+def semicircle_difference_field(
+    image: ndarray, neighbourhood_radius: int = 4, dtype="float64"
+) -> ndarray:
+    """The maximum semicircle difference around every pixel, without caching"""
+    return max_semicircle_difference(
+        image=asarray(image), radius=neighbourhood_radius
+    ).astype(dtype, copy=False)
+
+
+def _image_digest(image: ndarray) -> tuple[str, tuple[int, ...], str]:
+    return sha256(ascontiguousarray(image)).hexdigest(), image.shape, image.dtype.str
+
+
+def gradient_fields(
+    image: ndarray, radii: Sequence[int], dtype="float64"
+) -> dict[int, ndarray]:
+    """The maximum semicircle difference around every pixel for each radius, cached per image and radius"""
+    image = asarray(image)
+    digest = _image_digest(image=image)
+    missing_radii = sorted(
+        radius for radius in set(radii) if (digest, radius) not in _gradient_fields
+    )
+    if missing_radii:
+        _add_gradient_fields(image=image, digest=digest, radii=missing_radii)
+    fields = {}
+    for radius in radii:
+        _gradient_fields.move_to_end((digest, radius))
+        fields[radius] = _gradient_fields[(digest, radius)].astype(dtype, copy=False)
+    while (
+        sum(field.nbytes for field in _gradient_fields.values())
+        > MAX_CACHED_GRADIENT_BYTES
+    ):
+        _gradient_fields.popitem(last=False)
+    return fields
+
+
+def _add_gradient_fields(image: ndarray, digest: tuple, radii: list[int]) -> None:
+    """Cache the (float64) fields of the sorted radii"""
+    for radius, sums, counts in _growing_segment_sums(image=image, radii=radii):
+        field = _max_semicircle_difference_from_sums(sums=sums, counts=counts)
+        field.flags.writeable = False
+        _gradient_fields[(digest, radius)] = field
+
+
+def gradient_field(
+    image: ndarray, neighbourhood_radius: int = 4, dtype="float64"
+) -> ndarray:
+    """The cached maximum semicircle difference around every pixel, to threshold with threshold_contours"""
+    return gradient_fields(image=image, radii=[neighbourhood_radius], dtype=dtype)[
+        neighbourhood_radius
+    ]
+
+
+def threshold_contours(field: ndarray, threshold: float, dtype="float64") -> ndarray:
+    """Mark the pixels whose maximum semicircle difference is below the threshold (inside a domain)"""
+    return (field < threshold).astype(dtype)
+
+
 def detect_contours(
-    image: ndarray, neighbourhood_radius: int, threshold: float
+    image: ndarray, neighbourhood_radius: int = 4, threshold: float = 0.2
 ) -> ndarray:
     """Draw the contours for the given image using semicircle-difference heuristic"""
-    contours = zeros_like(image)
-    width, height = contours.shape
-    for y in range(width):
-        for x in range(height):
-            contours[y][x] = is_contour(
-                coordinate=(x, y),
-                radius=neighbourhood_radius,
-                image=image,
-                difference_threshold=threshold,
-            )
-    return contours
+    image = asarray(image)
+    return threshold_contours(
+        field=max_semicircle_difference(image=image, radius=neighbourhood_radius),
+        threshold=threshold,
+        dtype=image.dtype,
+    )
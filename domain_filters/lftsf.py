@@ -1,18 +1,73 @@
-from typing import List
+from functools import lru_cache
+from os import getpid, replace
+from pathlib import Path
+from threading import get_ident
+from typing import Callable, List, Optional
 
-from numpy import ndarray, zeros
+from numpy import (
+    arange,
+    asarray,
+    empty,
+    errstate,
+    load,
+    ndarray,
+    save,
+    uint64,
+    unique,
+    zeros,
+)
 from numpy.fft import irfft2, rfft2
 from numpy.lib.stride_tricks import sliding_window_view
 
+DEFAULT_CACHE_DIRECTORY = Path.home() / ".cache" / "domain_filters"
+MAX_WINDOW_BITS = 64
+LOOKUP_TABLE_VERSION = 1
+_lookup_tables: dict[tuple[int, float], ndarray] = {}
+
+
+@lru_cache(maxsize=None)
+def threaded_fft() -> tuple[Callable, Callable]:
+    """scipy.fft's (multithreaded) rfft2 and irfft2, imported on first use (None when scipy is not installed)"""
+    try:
+        from scipy.fft import irfft2, rfft2
+    except ImportError:
+        return None, None
+    return rfft2, irfft2
+
 
 class LocalisedFourierTransformSelfFilter:
     def __init__(
-        self, localisation_size: int = 4, binarisation_threshold: float = 0.5
+        self,
+        localisation_size: int = 4,
+        binarisation_threshold: float = 0.5,
+        batched: bool = True,
+        chunk_size: int = 2**16,
+        workers: int = -1,
+        tie_tolerance: float = 1e-4,
+        memoised: bool = True,
+        max_lookup_table_size: int = 4,
+        cache_directory: Path = DEFAULT_CACHE_DIRECTORY,
     ) -> None:
         self._localisation_size = localisation_size
         self._binarisation_threshold = binarisation_threshold
+        self._batched = batched
+        self._chunk_size = chunk_size
+        self._workers = workers
+        self._tie_tolerance = tie_tolerance
+        self._memoised = memoised
+        self._max_lookup_table_size = max_lookup_table_size
+        self._cache_directory = Path(cache_directory)
 
     def classify_spacetime(self, spacetime: List[List[int]]) -> ndarray:
+        spacetime = asarray(spacetime)
+        if (
+            self._memoised
+            and self._localisation_size**2 <= MAX_WINDOW_BITS
+            and ((spacetime == 0) | (spacetime == 1)).all()
+        ):
+            return self.classify_spacetime_memoised(spacetime=spacetime)
+        if self._batched:
+            return self.classify_spacetime_batched(spacetime=spacetime)
         filtered_spacetime = zeros(spacetime.shape)
         for i, row in enumerate(
             self._submatrices(
@@ -27,6 +82,123 @@ class LocalisedFourierTransformSelfFilter:
                 )
         return filtered_spacetime
 
+    def classify_spacetime_batched(self, spacetime: ndarray) -> ndarray:
+        """Classify blocks of (at most chunk_size) window cells with one FFT call per block"""
+        filtered_spacetime = zeros(spacetime.shape)
+        submatrices = self._submatrices(
+            matrix=spacetime,
+            submatrix_width=self._localisation_size,
+            submatrix_height=self._localisation_size,
+        )
+        n_rows, n_columns = submatrices.shape[:2]
+        n_windows = n_rows * n_columns
+        windows_per_chunk = max(1, self._chunk_size // self._localisation_size**2)
+        for start in range(0, n_windows, windows_per_chunk):
+            indices = arange(start, min(start + windows_per_chunk, n_windows))
+            rows, columns = indices // n_columns, indices % n_columns
+            filtered_spacetime[rows, columns] = self.classify_submatrices(
+                submatrices=submatrices[rows, columns]
+            )
+        return filtered_spacetime
+
+    def classify_spacetime_memoised(self, spacetime: ndarray) -> ndarray:
+        """Classify a binary spacetime by bit-packing every window into an integer key and classifying each distinct key only once (chunk_size window cells at a time)"""
+        filtered_spacetime = zeros(spacetime.shape)
+        keys = self._window_keys(
+            matrix=spacetime, submatrix_size=self._localisation_size
+        )
+        n_rows, n_columns = keys.shape
+        if self._localisation_size <= self._max_lookup_table_size:
+            classification = self.lookup_table()[keys]
+        else:
+            unique_keys, inverse = unique(keys, return_inverse=True)
+            unique_classification = self.classify_window_keys(keys=unique_keys)
+            classification = unique_classification[inverse.reshape(keys.shape)]
+        filtered_spacetime[:n_rows, :n_columns] = classification
+        return filtered_spacetime
+
+    def classify_window_keys(self, keys: ndarray) -> ndarray:
+        """Classify the windows of a flat array of keys, chunk_size window cells at a time"""
+        classification = empty(len(keys), dtype=bool)
+        keys_per_chunk = max(1, self._chunk_size // self._localisation_size**2)
+        for start in range(0, len(keys), keys_per_chunk):
+            end = min(start + keys_per_chunk, len(keys))
+            classification[start:end] = self.classify_submatrices(
+                submatrices=self._decode_window_keys(
+                    keys=keys[start:end], submatrix_size=self._localisation_size
+                )
+            )
+        return classification
+
+    def lookup_table(self) -> ndarray:
+        """The classification of every possible binary window, built once per (size, threshold) and cached on disk"""
+        table_key = (self._localisation_size, self._binarisation_threshold)
+        if table_key not in _lookup_tables:
+            n_windows = 2 ** (self._localisation_size**2)
+            path = self._cache_directory / (
+                f"lftsf_v{LOOKUP_TABLE_VERSION}_{self._localisation_size}"
+                f"_{self._binarisation_threshold!r}.npy"
+            )
+            table = self._load_lookup_table(path=path, n_windows=n_windows)
+            if table is None:
+                table = self.classify_window_keys(keys=arange(n_windows, dtype=uint64))
+                self._save_lookup_table(path=path, table=table)
+            _lookup_tables[table_key] = table
+        return _lookup_tables[table_key]
+
+    @staticmethod
+    def _load_lookup_table(path: Path, n_windows: int) -> Optional[ndarray]:
+        """The table stored at the path, or None when it is missing, unreadable or malformed"""
+        try:
+            table = load(path)
+        except (OSError, ValueError):
+            return None
+        if table.shape != (n_windows,) or table.dtype != bool:
+            return None
+        return table
+
+    @staticmethod
+    def _save_lookup_table(path: Path, table: ndarray) -> None:
+        """Store the table for other processes, keeping it in memory only when the directory is not writable"""
+        temporary_path = path.with_suffix(f".{getpid()}.{get_ident()}.tmp.npy")
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            save(temporary_path, table)
+            replace(temporary_path, path)
+        except OSError:
+            try:
+                temporary_path.unlink(missing_ok=True)
+            except OSError:
+                pass
+
+    def classify_submatrices(self, submatrices: ndarray) -> ndarray:
+        """Vectorised classify_submatrix over the last two axes"""
+        all_zero = ~submatrices.any(axis=(-2, -1))
+        threaded_rfft2, threaded_irfft2 = threaded_fft()
+        if threaded_rfft2 is None:
+            ratios = self._fourier_transform_self_filter_ratios(
+                matrices=submatrices.astype("float32"), fft=rfft2, ifft=irfft2
+            )
+        else:
+            ratios = self._fourier_transform_self_filter_ratios(
+                matrices=submatrices.astype("float32"),
+                fft=lambda x: threaded_rfft2(x, workers=self._workers),
+                ifft=lambda x: threaded_irfft2(x, workers=self._workers),
+            )
+        classification = ratios > self._binarisation_threshold
+        ambiguous = abs(ratios - self._binarisation_threshold) <= self._tie_tolerance
+        ambiguous |= ratios != ratios
+        if ambiguous.any():
+            classification[ambiguous] = (
+                self._fourier_transform_self_filter_ratios(
+                    matrices=submatrices[ambiguous].astype("float64"),
+                    fft=rfft2,
+                    ifft=irfft2,
+                )
+                > self._binarisation_threshold
+            )
+        return all_zero | classification
+
     def classify_submatrix(self, submatrix: ndarray) -> bool:
         if not submatrix.any():
             return True
@@ -43,6 +215,34 @@ class LocalisedFourierTransformSelfFilter:
         binary_regular_patterns = regular_patterns_normalised > theta
         return binary_regular_patterns[0, 0]
 
+    @staticmethod
+    def _fourier_transform_self_filter_ratios(
+        matrices: ndarray, fft: Callable, ifft: Callable
+    ) -> ndarray:
+        """The normalised self-filtered value at the origin of every matrix (compared against theta)"""
+        regular_patterns = ifft(fft(matrices) ** 2)
+        with errstate(divide="ignore", invalid="ignore"):
+            return regular_patterns[..., 0, 0] / regular_patterns.max(axis=(-2, -1))
+
+    @staticmethod
+    def _window_keys(matrix: ndarray, submatrix_size: int) -> ndarray:
+        """Bit-pack every (binary) submatrix into an integer, row-major from the least significant bit"""
+        height, width = matrix.shape
+        n_rows, n_columns = height - submatrix_size + 1, width - submatrix_size + 1
+        keys = zeros((n_rows, n_columns), dtype=uint64)
+        for i in range(submatrix_size):
+            for j in range(submatrix_size):
+                bits = matrix[i : i + n_rows, j : j + n_columns].astype(uint64)
+                keys |= bits << uint64(i * submatrix_size + j)
+        return keys
+
+    @staticmethod
+    def _decode_window_keys(keys: ndarray, submatrix_size: int) -> ndarray:
+        """Unpack integer keys back into binary submatrices"""
+        bit_positions = arange(submatrix_size**2, dtype=uint64)
+        bits = (keys[:, None] >> bit_positions) & uint64(1)
+        return bits.reshape(-1, submatrix_size, submatrix_size)
+
     @staticmethod
     def _submatrices(
         matrix: List[List[int]], submatrix_width: int, submatrix_height: int
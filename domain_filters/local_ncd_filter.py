@@ -1,11 +1,84 @@
+from bz2 import compress as bz2_compress
+from functools import lru_cache
 from gzip import compress
+from lzma import compress as lzma_compress
+from typing import Optional
+from zlib import DEFLATED, compressobj
 
-from numpy import ndarray, zeros_like
+from numpy import asarray, ndarray, zeros, zeros_like
 
 approx_kolmogorov_complexity = lambda text: len(compress(text.encode("utf-8")))
 
+DEFLATE_WINDOW_BITS = {"gzip": 31, "zlib": 15, "deflate": -15}
+COMPRESSORS = (*DEFLATE_WINDOW_BITS, "bz2", "lzma")
+MAX_PRIMED_STATES = 32
 
-def NCD(x: str, y: str) -> float:
+LIGHTCONE_HILBERT_CURVE_OFFSETS = [
+    (-2, 2),
+    (-1, 1),
+    (0, 0),
+    (-1, -1),
+    (-1, 0),
+    (-2, -1),
+    (-2, 0),
+    (-2, -2),
+]
+
+
+class Compressor:
+    """Approximate Kolmogorov complexity as a compressed length, caching (up to cache_size) complexities and deflate states primed with each prefix"""
+
+    def __init__(
+        self, name: str = "gzip", level: int = 9, cache_size: int = 2**16
+    ) -> None:
+        if name not in COMPRESSORS:
+            raise ValueError(f"unknown compressor {name}, expected one of {COMPRESSORS}")
+        self._name = name
+        self._level = level
+        self.complexity = lru_cache(maxsize=cache_size)(self._complexity)
+        self.joint_complexity = lru_cache(maxsize=cache_size)(self._joint_complexity)
+        self._primed = lru_cache(maxsize=MAX_PRIMED_STATES)(self._prime)
+
+    def ncd(self, x: str, y: str) -> float:
+        K_x = self.complexity(x)
+        K_y = self.complexity(y)
+        K_min = min(K_x, K_y)
+        K_max = max(K_x, K_y)
+        distance_information = self.joint_complexity(x, y) - K_min
+        return distance_information / K_max
+
+    def _complexity(self, text: str) -> int:
+        return self._joint_complexity(text, "")
+
+    def _joint_complexity(self, x: str, y: str) -> int:
+        """K(x+y), continuing from a copy of the state primed with x where the backend allows it"""
+        if self._name == "bz2":
+            return len(bz2_compress((x + y).encode("utf-8"), self._level))
+        if self._name == "lzma":
+            return len(lzma_compress((x + y).encode("utf-8"), preset=self._level))
+        prefix_length, compressor = self._primed(x)
+        compressor = compressor.copy()
+        return (
+            prefix_length
+            + len(compressor.compress(y.encode("utf-8")))
+            + len(compressor.flush())
+        )
+
+    def _prime(self, prefix: str) -> tuple[int, object]:
+        compressor = compressobj(
+            self._level, DEFLATED, DEFLATE_WINDOW_BITS[self._name]
+        )
+        return len(compressor.compress(prefix.encode("utf-8"))), compressor
+
+
+@lru_cache(maxsize=None)
+def get_compressor(name: str = "gzip", level: int = 9) -> Compressor:
+    return Compressor(name=name, level=level)
+
+
+def NCD(x: str, y: str, compressor: Optional[Compressor] = None) -> float:
+    if compressor is not None:
+        return compressor.ncd(x=x, y=y)
     K_x = approx_kolmogorov_complexity(x)
     K_y = approx_kolmogorov_complexity(y)
     K_min = min(K_x, K_y)
@@ -26,14 +99,7 @@ def vectorise_neighbourhood(
 ) -> list[int]:
     """Hilbert Curve for 2D light cone"""
     coordinates_lightcone_hilbert_curve = [
-        (y - 2, x + 2),
-        (y - 1, x + 1),
-        (y, x),
-        (y - 1, x - 1),
-        (y - 1, x),
-        (y - 2, x - 1),
-        (y - 2, x),
-        (y - 2, x - 2),
+        (y + dy, x + dx) for dy, dx in LIGHTCONE_HILBERT_CURVE_OFFSETS
     ]
     return [spacetime[coord] for coord in coordinates_lightcone_hilbert_curve]
 
@@ -69,8 +135,10 @@ def normalised_compression_distance(
     spacetime: list[list[int]],
     x: int,
     y: int,
+    compressor: Optional[Compressor] = None,
 ) -> float:
     return NCD(
+        compressor=compressor,
         x="".join(
             map(
                 str,
@@ -92,23 +160,76 @@ def normalised_compression_distance(
     )
 
 
-def local_ncd(spacetime: ndarray, neighbourhood_radius: int = 1) -> ndarray:
+def lightcone_codes(spacetime: ndarray) -> ndarray:
+    """8-bit code of every (binary) light cone, read along the Hilbert curve from the most significant bit (rows and columns without a full light cone are left 0)"""
+    t, w = spacetime.shape
+    codes = zeros((t, w), dtype="int64")
+    if t < 3 or w < 5:
+        return codes
+    n_bits = len(LIGHTCONE_HILBERT_CURVE_OFFSETS)
+    for bit, (dy, dx) in enumerate(LIGHTCONE_HILBERT_CURVE_OFFSETS):
+        cells = spacetime[2 + dy : t + dy, 2 + dx : w - 2 + dx].astype("int64")
+        codes[2:, 2 : w - 2] |= cells << (n_bits - 1 - bit)
+    return codes
+
+
+@lru_cache(maxsize=None)
+def lightcone_ncd_table(compressor: str = "gzip", level: int = 9) -> ndarray:
+    """NCD between every pair of (past, current) binary light cone codes, once per compressor configuration"""
+    ncd = get_compressor(name=compressor, level=level).ncd
+    n_bits = len(LIGHTCONE_HILBERT_CURVE_OFFSETS)
+    lightcones = [format(code, f"0{n_bits}b") for code in range(2**n_bits)]
+    table = zeros((len(lightcones), len(lightcones)), dtype="float32")
+    for i, past in enumerate(lightcones):
+        for j, current in enumerate(lightcones):
+            table[i, j] = ncd(x=past, y=current)
+    table.flags.writeable = False
+    return table
+
+
+def local_ncd(
+    spacetime: ndarray,
+    neighbourhood_radius: int = 1,
+    compressor: str = "gzip",
+    level: int = 9,
+) -> ndarray:
     """Uses past lightcone for input"""
+    spacetime = asarray(spacetime)
     filtered = zeros_like(spacetime, dtype="float32")
     t, w = filtered.shape
+    if spacetime.dtype.kind in "iu" and ((spacetime == 0) | (spacetime == 1)).all():
+        codes = lightcone_codes(spacetime=spacetime)
+        y_start, x_start = neighbourhood_radius + 3, neighbourhood_radius + 3
+        filtered[y_start:, x_start : w - 3] = lightcone_ncd_table(
+            compressor=compressor, level=level
+        )[
+            codes[y_start - 1 : t - 1, x_start : w - 3],
+            codes[y_start:, x_start : w - 3],
+        ]
+        return filtered
     for y_ in range(neighbourhood_radius + 3, t):
         for x_ in range(neighbourhood_radius + 3, w - 3):
             filtered[y_, x_] = normalised_compression_distance(
                 spacetime=spacetime,
                 x=x_,
                 y=y_,
+                compressor=get_compressor(name=compressor, level=level),
             )
     return filtered
 
 
 
-def local_ncd2(spacetime: ndarray, neighbourhood_radius: int = 4) -> ndarray:
+def local_ncd2(
+    spacetime: ndarray,
+    neighbourhood_radius: int = 4,
+    compressor: str = "gzip",
+    level: int = 9,
+    cache_size: int = 2**16,
+) -> ndarray:
     """NCD gives distance from neighbourhood to several regular domain patterns. The minimum distance is taken to see if the neighbourhood was similar to any regular domain patterns"""
+    ncd = Compressor(name=compressor, level=level, cache_size=cache_size).ncd
+
+    @lru_cache(maxsize=cache_size)
     def is_domain(neighbourhood:str) -> float:
         regular_patterns = [
             '000000000',
@@ -128,8 +249,9 @@ def local_ncd2(spacetime: ndarray, neighbourhood_radius: int = 4) -> ndarray:
             '000110001',
             '111001110',
         ]
-        return min(NCD(x=pattern, y=neighbourhood) for pattern in regular_patterns)
+        return min(ncd(x=pattern, y=neighbourhood) for pattern in regular_patterns)
     
+    spacetime = asarray(spacetime)
     filtered = zeros_like(spacetime, dtype="float32")
     t, w = filtered.shape
     for y_ in range(neighbourhood_radius, t):
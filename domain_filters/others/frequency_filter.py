@@ -1,16 +1,50 @@
-from matplotlib.pyplot import bar, show
-from numpy import array, concatenate, mean, ndarray, std
+from numpy import array, asarray, bincount, intp, mean, ndarray, pad, std, zeros
+
+
+def neighbourhood_codes(
+    spacetime_evolution: ndarray, radius: int = 1, periodic: bool = False
+) -> ndarray:
+    """Read every row's (2r+1)-cell neighbourhoods as binary numbers, leftmost cell most significant (only the neighbourhoods that fit inside each row, unless periodic)"""
+    spacetime_evolution = asarray(spacetime_evolution).astype(intp, copy=False)
+    if periodic:
+        spacetime_evolution = pad(
+            spacetime_evolution, ((0, 0), (radius, radius)), mode="wrap"
+        )
+    n_codes = max(0, spacetime_evolution.shape[1] - 2 * radius)
+    codes = zeros((len(spacetime_evolution), n_codes), dtype=intp)
+    for offset in range(2 * radius + 1):
+        codes <<= 1
+        codes |= spacetime_evolution[:, offset : offset + n_codes]
+    return codes
+
+
+def neighbourhood_labels(radius: int = 1) -> list[str]:
+    return [
+        format(code, f"0{2 * radius + 1}b") for code in range(2 ** (2 * radius + 1))
+    ]
+
+
+def neighbourhood_counts(spacetime_evolution: ndarray, radius: int = 1) -> ndarray:
+    """How often each neighbourhood occurs, indexed by its code"""
+    return bincount(
+        neighbourhood_codes(
+            spacetime_evolution=spacetime_evolution, radius=radius
+        ).ravel(),
+        minlength=2 ** (2 * radius + 1),
+    )
 
 
 def neighbourhood_frequency(
     spacetime_evolution: ndarray, neighbourhoods: list[str]
-) -> None:
-    frequencies = {neighbourhood: 0 for neighbourhood in neighbourhoods}
-    for row in spacetime_evolution:
-        for a, b, c in zip(row, row[1:], row[2:]):
-            neighbourhood = f"{a}{b}{c}"
-            frequencies[neighbourhood] += 1
-    return frequencies
+) -> dict[str, int]:
+    radius = len(neighbourhoods[0]) // 2
+    counts = neighbourhood_counts(
+        spacetime_evolution=spacetime_evolution, radius=radius
+    )
+    return {
+        neighbourhood: int(counts[int(neighbourhood, 2)])
+        for neighbourhood in neighbourhoods
+    }
 
 
 def relatively_high_frequencies(frequencies: list[int]) -> list[int]:
@@ -19,48 +53,57 @@ def relatively_high_frequencies(frequencies: list[int]) -> list[int]:
     ]
 
 
+def frequency_table(spacetime_evolution: ndarray, radius: int = 1) -> ndarray:
+    """1 for every neighbourhood more than a standard deviation more frequent than the mean neighbourhood, indexed by code"""
+    counts = neighbourhood_counts(
+        spacetime_evolution=spacetime_evolution, radius=radius
+    )
+    return (counts > counts.mean() + counts.std()).astype(int)
+
+
 def filter_spacetime(
     spacetime_evolution: ndarray, transition_rule: dict[str, int]
 ) -> ndarray:
-    filtered_spacetime = []
-    for row in spacetime_evolution:
-        filtered_row = []
-        for a, b, c in zip(
-            concatenate([[row[-1]], row[:-1]]), row, concatenate([row[1:], [row[0]]])
-        ):
-            neighbourhood = f"{a}{b}{c}"
-            cell = transition_rule[neighbourhood]
-            filtered_row.append(cell)
-        filtered_spacetime.append(array(filtered_row))
-    return array(filtered_spacetime)
+    radius = len(next(iter(transition_rule))) // 2
+    table = zeros(2 ** (2 * radius + 1), dtype=int)
+    for neighbourhood, cell in transition_rule.items():
+        table[int(neighbourhood, 2)] = cell
+    return apply_table(
+        spacetime_evolution=spacetime_evolution, table=table, radius=radius
+    )
+
+
+def apply_table(
+    spacetime_evolution: ndarray, table: ndarray, radius: int = 1
+) -> ndarray:
+    """Replace every cell by the table entry of its (periodic) neighbourhood in one gather"""
+    return table[
+        neighbourhood_codes(
+            spacetime_evolution=spacetime_evolution, radius=radius, periodic=True
+        )
+    ]
 
 
 def filter_by_lookup_frequency(
-    spacetime_evolution: ndarray, display: bool = False
+    spacetime_evolution: ndarray, display: bool = False, radius: int = 1
 ) -> ndarray:
-    neighbourhoods = ["111", "110", "101", "100", "011", "010", "001", "000"]
-    frequencies = neighbourhood_frequency(
-        spacetime_evolution=spacetime_evolution, neighbourhoods=neighbourhoods
-    )
-    high_freq = relatively_high_frequencies(frequencies=list(frequencies.values()))
-    high_frequencies = {
-        key: value for key, value in frequencies.items() if value in high_freq
-    }
-    filter_transition_table = {
-        neighbourhood: int(neighbourhood in high_frequencies)
-        for neighbourhood in neighbourhoods
-    }
-    filtered_spacetime = filter_spacetime(
-        spacetime_evolution=spacetime_evolution, transition_rule=filter_transition_table
+    spacetime_evolution = asarray(spacetime_evolution)
+    table = frequency_table(spacetime_evolution=spacetime_evolution, radius=radius)
+    filtered_spacetime = apply_table(
+        spacetime_evolution=spacetime_evolution, table=table, radius=radius
     )
     if display:
-        print(frequencies)
-        print(filter_transition_table)
-        low_frequencies = {
-            key: value for key, value in frequencies.items() if value not in high_freq
-        }
-        bar(low_frequencies.keys(), low_frequencies.values())
-        bar(high_frequencies.keys(), high_frequencies.values())
+        from matplotlib.pyplot import bar, show
+
+        neighbourhoods = array(neighbourhood_labels(radius=radius))[::-1]
+        counts = neighbourhood_counts(
+            spacetime_evolution=spacetime_evolution, radius=radius
+        )[::-1]
+        high = table[::-1].astype(bool)
+        print(dict(zip(neighbourhoods.tolist(), counts.tolist())))
+        print(dict(zip(neighbourhoods.tolist(), table[::-1].tolist())))
+        bar(neighbourhoods[~high], counts[~high])
+        bar(neighbourhoods[high], counts[high])
         show()
     return filtered_spacetime
 
@@ -1,9 +1,35 @@
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import repeat
+from json import dumps, loads
 from math import log
-from typing import Generator
+from pathlib import Path
+from typing import Generator, Iterable, Union
 
-from numpy import mean, ndarray, zeros_like
-from scipy.spatial.distance import cosine
+from numpy import (
+    arange,
+    argmin,
+    array,
+    asarray,
+    concatenate,
+    flatnonzero,
+    full,
+    load,
+    ndarray,
+    save,
+    searchsorted,
+    sqrt,
+    unique,
+    where,
+    zeros,
+    zeros_like,
+)
+
+from domain_filters.automata import spacetime as elementary_spacetime
+
+MAX_INTEGER_KEY_BITS = 62
+MERGE_STRATEGIES = ("all", "first", "nearest")
 
 
 def coordinates_lightcone(
@@ -52,62 +78,140 @@ def cell_values(
         yield spacetime[coord]
 
 
+@lru_cache(maxsize=None)
+def lightcone_offsets(lightcone_depth: int, spread_rate: int = 1) -> ndarray:
+    """(time, space) offsets of every cell of a future light cone, in the order coordinates_lightcone visits them (negate the time offsets for the past light cone)"""
+    offsets = [
+        (row_index, dx)
+        for row_index in range(1, lightcone_depth)
+        for dx in range(-row_index * spread_rate, row_index * spread_rate)
+    ]
+    offsets = array(offsets, dtype="int64").reshape(-1, 2)
+    offsets.flags.writeable = False
+    return offsets
+
+
+def _key_dtype(n_bits: int) -> str:
+    return "int64" if n_bits <= MAX_INTEGER_KEY_BITS else "object"
+
+
+def _wrapped_cells(
+    spacetime: ndarray, rows: slice, row_offset: int, column_offset: int
+) -> ndarray:
+    max_time, max_space = spacetime.shape
+    columns = (arange(max_space) + column_offset) % max_space
+    start, stop, _ = rows.indices(max_time)
+    return spacetime[start + row_offset : stop + row_offset][:, columns]
+
+
+def past_lightcone_keys(
+    spacetime: ndarray, lightcone_depth: int, spread_rate: int = 1
+) -> ndarray:
+    """Pack every (possibly partial) binary past light cone into an integer whose leading 1 marks its length, so that format(key, "b")[1:] is the old string representation"""
+    spacetime = asarray(spacetime) != 0
+    offsets = lightcone_offsets(
+        lightcone_depth=lightcone_depth, spread_rate=spread_rate
+    )
+    max_time, _ = spacetime.shape
+    keys = full(spacetime.shape, 1, dtype=_key_dtype(len(offsets) + 1))
+    for row_index, dx in offsets:
+        first_row = row_index + 1
+        if first_row >= max_time:
+            continue
+        cells = _wrapped_cells(
+            spacetime=spacetime,
+            rows=slice(first_row, max_time),
+            row_offset=-row_index,
+            column_offset=dx,
+        )
+        keys[first_row:] = keys[first_row:] * 2 + cells
+    return keys
+
+
+def future_lightcone_cells(
+    spacetime: ndarray, lightcone_depth: int, spread_rate: int = 1
+) -> ndarray:
+    """The cells of every complete future light cone, shaped (time, space, cone size) for the rows that have one"""
+    spacetime = asarray(spacetime)
+    offsets = lightcone_offsets(
+        lightcone_depth=lightcone_depth, spread_rate=spread_rate
+    )
+    max_time, max_space = spacetime.shape
+    n_rows = max(max_time - lightcone_depth, 0)
+    cells = zeros_like(spacetime, shape=(n_rows, max_space, len(offsets)))
+    for index, (row_index, dx) in enumerate(offsets):
+        cells[..., index] = _wrapped_cells(
+            spacetime=spacetime,
+            rows=slice(0, n_rows),
+            row_offset=row_index,
+            column_offset=dx,
+        )
+    return cells
+
+
+def lightcone_repr(key: int) -> str:
+    """The string representation of a packed past light cone key"""
+    return format(int(key), "b")[1:]
+
+
 def past_lightcones(
     spacetimes: list[ndarray],
     lightcone_depth: int,
-) -> dict[str, set[tuple]]:
-    past_lightcone_to_future_lightcones = defaultdict(set)
-    for spacetime in spacetimes:
-        max_time, max_space = spacetime.shape
-        for t in range(max_time):
-            for x in range(max_space):
-                past_lightcone_repr = "".join(
-                    map(
-                        str,
-                        cell_values(
-                            spacetime=spacetime,
-                            coordinates=coordinates_lightcone(
-                                x=x,
-                                t=t,
-                                max_space=max_space,
-                                max_time=max_time,
-                                lightcone_depth=-lightcone_depth,
-                                allow_partial_cones=True,
-                            ),
-                        ),
-                    )
-                )
-                future_lightcone = tuple(
-                    cell_values(
-                        spacetime=spacetime,
-                        coordinates=coordinates_lightcone(
-                            x=x,
-                            t=t,
-                            max_space=max_space,
-                            max_time=max_time,
-                            lightcone_depth=lightcone_depth,
-                            allow_partial_cones=False,
-                        ),
-                    )
+    n_workers: int = 1,
+    chunk_size: int = 1,
+) -> dict[int, set[tuple]]:
+    """Map each past light cone to its distinct future light cones, splitting the spacetimes over n_workers processes when n_workers > 1"""
+    if n_workers > 1:
+        chunks = [
+            spacetimes[start : start + chunk_size]
+            for start in range(0, len(spacetimes), chunk_size)
+        ]
+        with ProcessPoolExecutor(max_workers=n_workers) as pool:
+            return merge_past_lightcones(
+                partial_past_lightcones=pool.map(
+                    past_lightcones, chunks, repeat(lightcone_depth)
                 )
-                if any(future_lightcone):
-                    past_lightcone_to_future_lightcones[past_lightcone_repr].add(
-                        future_lightcone
-                    )
+            )
+    past_lightcone_to_future_lightcones = defaultdict(set)
+    for spacetime in map(asarray, spacetimes):
+        future_cells = future_lightcone_cells(
+            spacetime=spacetime, lightcone_depth=lightcone_depth
+        )
+        n_rows, _, n_future_cells = future_cells.shape
+        past_keys = past_lightcone_keys(
+            spacetime=spacetime, lightcone_depth=lightcone_depth
+        )[:n_rows]
+        has_future = future_cells.any(axis=-1)
+        past_keys, future_cells = past_keys[has_future], future_cells[has_future]
+        pair_keys = past_keys.astype(
+            _key_dtype(len(lightcone_offsets(lightcone_depth)) + 1 + n_future_cells)
+        )
+        for cell in (future_cells != 0).T:
+            pair_keys = pair_keys * 2 + cell
+        _, first_indices = unique(pair_keys, return_index=True)
+        for index in sorted(first_indices):
+            past_lightcone_to_future_lightcones[int(past_keys[index])].add(
+                tuple(future_cells[index].tolist())
+            )
     return past_lightcone_to_future_lightcones
 
 
-def average(lightcones: set[tuple]) -> ndarray:
-    return mean(list(lightcones), axis=0)
-
-
-def distance(candidate_lightcone: ndarray, lightcone_distribution: ndarray) -> float:
-    return cosine(candidate_lightcone, lightcone_distribution)
+def merge_past_lightcones(
+    partial_past_lightcones: Iterable[dict[int, set[tuple]]],
+) -> dict[int, set[tuple]]:
+    """Union partial results in the order given, so the merged insertion order matches a serial run"""
+    past_lightcone_to_future_lightcones = defaultdict(set)
+    for partial in partial_past_lightcones:
+        for past_lightcone_repr, future_lightcones in partial.items():
+            past_lightcone_to_future_lightcones[past_lightcone_repr].update(
+                future_lightcones
+            )
+    return past_lightcone_to_future_lightcones
 
 
 def statistical_complexities(
     causal_state_to_past_lightcones: dict[int, list[tuple]],
-    past_lightcone_to_causal_state: dict[str, int],
+    past_lightcone_to_causal_state: dict[int, int],
 ) -> dict[int, float]:
     n_past_lightcones = len(past_lightcone_to_causal_state)
     statistical_comlpexities = {}
@@ -117,36 +221,81 @@ def statistical_complexities(
     return statistical_comlpexities
 
 
+class CausalStateCentroids:
+    """Running sum of the distinct future light cones merged into each causal state (cosine distance is scale invariant, so the exact integer sums stand in for the means)"""
+
+    def __init__(self, n_features: int, capacity: int = 64) -> None:
+        self._future_lightcones = []
+        self._sums = zeros((capacity, n_features))
+        self._squared_norms = zeros(capacity)
+
+    def __len__(self) -> int:
+        return len(self._future_lightcones)
+
+    def distances(self, future_lightcones: set[tuple]) -> ndarray:
+        """Cosine distance from the candidate's centroid to every causal state centroid in one matrix-vector product"""
+        n_states = len(self)
+        candidate_sum = array(list(future_lightcones), dtype="float64").sum(axis=0)
+        similarities = self._sums[:n_states] @ candidate_sum
+        return 1.0 - similarities / sqrt(
+            self._squared_norms[:n_states] * (candidate_sum @ candidate_sum)
+        )
+
+    def add_state(self, future_lightcones: set[tuple]) -> int:
+        index = len(self)
+        if index == len(self._sums):
+            self._sums = concatenate([self._sums, zeros_like(self._sums)])
+            self._squared_norms = concatenate(
+                [self._squared_norms, zeros_like(self._squared_norms)]
+            )
+        self._future_lightcones.append(set())
+        self.merge(index=index, future_lightcones=future_lightcones)
+        return index
+
+    def merge(self, index: int, future_lightcones: set[tuple]) -> None:
+        new_lightcones = future_lightcones - self._future_lightcones[index]
+        if not new_lightcones:
+            return
+        self._future_lightcones[index] |= new_lightcones
+        self._sums[index] += array(list(new_lightcones)).sum(axis=0)
+        self._squared_norms[index] = self._sums[index] @ self._sums[index]
+
+
 def causal_states(
-    past_lightcones: dict[str, set[tuple]],
+    past_lightcones: dict[int, set[tuple]],
     similarity_threshold: float,
-) -> tuple[dict[str, int], dict[int, float]]:
-    causal_state_to_future_lightcones = {}
+    merge_strategy: str = "all",
+) -> tuple[dict[int, int], dict[int, float]]:
+    """Cluster past light cones by the cosine distance between their averaged future light cones, joining every ("all", as originally), the "first" or the "nearest" causal state under the threshold"""
+    if merge_strategy not in MERGE_STRATEGIES:
+        raise ValueError(
+            f"unknown merge strategy {merge_strategy}, expected one of {MERGE_STRATEGIES}"
+        )
+    causal_state_ids = []
     causal_state_to_past_lightcones = {}
     past_lightcone_to_causal_state = {}
+    centroids = None
 
     for past_lightcone_repr, candidate_future_lightcones in past_lightcones.items():
-        for (
-            causal_state,
-            future_lightcones,
-        ) in causal_state_to_future_lightcones.items():
-            if (
-                distance(
-                    candidate_lightcone=average(candidate_future_lightcones),
-                    lightcone_distribution=average(future_lightcones),
-                )
-                <= similarity_threshold
-            ):
-                future_lightcones |= candidate_future_lightcones
-                causal_state_to_past_lightcones[causal_state].append(
-                    past_lightcone_repr
-                )
-                past_lightcone_to_causal_state[past_lightcone_repr] = causal_state
-        if past_lightcone_repr not in past_lightcone_to_causal_state:
-            causal_state = hash(past_lightcone_repr)
-            causal_state_to_future_lightcones[
-                causal_state
-            ] = candidate_future_lightcones
+        if centroids is None:
+            centroids = CausalStateCentroids(
+                n_features=len(next(iter(candidate_future_lightcones)))
+            )
+        distances = centroids.distances(future_lightcones=candidate_future_lightcones)
+        matches = flatnonzero(distances <= similarity_threshold)
+        if len(matches) and merge_strategy == "first":
+            matches = matches[:1]
+        elif len(matches) and merge_strategy == "nearest":
+            matches = matches[[argmin(distances[matches])]]
+        for index in matches:
+            centroids.merge(index=index, future_lightcones=candidate_future_lightcones)
+            causal_state = causal_state_ids[index]
+            causal_state_to_past_lightcones[causal_state].append(past_lightcone_repr)
+            past_lightcone_to_causal_state[past_lightcone_repr] = causal_state
+        if not len(matches):
+            centroids.add_state(future_lightcones=candidate_future_lightcones)
+            causal_state = past_lightcone_repr
+            causal_state_ids.append(causal_state)
             causal_state_to_past_lightcones[causal_state] = [past_lightcone_repr]
             past_lightcone_to_causal_state[past_lightcone_repr] = causal_state
 
@@ -161,9 +310,11 @@ def statistical_complexity(
     spacetimes: list[ndarray],
     lightcone_depth: int,
     causal_state_clustering_similarity_threshold: float,
-) -> dict[str, float]:
+    merge_strategy: str = "all",
+    n_workers: int = 1,
+) -> dict[int, float]:
     past_lightcone_to_future_lightcones = past_lightcones(
-        spacetimes=spacetimes, lightcone_depth=lightcone_depth
+        spacetimes=spacetimes, lightcone_depth=lightcone_depth, n_workers=n_workers
     )
     (
         past_lightcone_to_causal_state,
@@ -171,6 +322,7 @@ def statistical_complexity(
     ) = causal_states(
         past_lightcones=past_lightcone_to_future_lightcones,
         similarity_threshold=causal_state_clustering_similarity_threshold,
+        merge_strategy=merge_strategy,
     )
     past_lightcone_to_statistical_complexity = {}
     for past_lightcone_repr, causal_state in past_lightcone_to_causal_state.items():
@@ -180,69 +332,131 @@ def statistical_complexity(
     return past_lightcone_to_statistical_complexity
 
 
+class StatisticalComplexityModel:
+    """Trained complexities stored as sorted packed past light cone keys with a parallel array of complexities"""
+
+    def __init__(
+        self, keys: ndarray, complexities: ndarray, lightcone_depth: int
+    ) -> None:
+        self.keys = keys
+        self.complexities = complexities
+        self.lightcone_depth = lightcone_depth
+
+    @classmethod
+    def from_dict(
+        cls,
+        past_lightcone_to_statistical_complexity: dict[int, float],
+        lightcone_depth: int,
+    ) -> "StatisticalComplexityModel":
+        keys = array(
+            list(past_lightcone_to_statistical_complexity),
+            dtype=_key_dtype(len(lightcone_offsets(lightcone_depth)) + 1),
+        )
+        complexities = array(
+            list(past_lightcone_to_statistical_complexity.values()), dtype="float64"
+        )
+        order = keys.argsort()
+        return cls(
+            keys=keys[order],
+            complexities=complexities[order],
+            lightcone_depth=lightcone_depth,
+        )
+
+    def save(self, path: Union[str, Path]) -> None:
+        if self.keys.dtype == object:
+            raise ValueError(
+                f"past light cones of depth {self.lightcone_depth} do not fit in {MAX_INTEGER_KEY_BITS}-bit keys, so the model cannot be saved"
+            )
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        save(path / "keys.npy", self.keys)
+        save(path / "complexities.npy", self.complexities)
+        (path / "metadata.json").write_text(
+            dumps({"lightcone_depth": self.lightcone_depth})
+        )
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> "StatisticalComplexityModel":
+        """Memory-map the arrays read-only, so processes loading the same model share its pages"""
+        path = Path(path)
+        metadata = loads((path / "metadata.json").read_text())
+        return cls(
+            keys=load(path / "keys.npy", mmap_mode="r"),
+            complexities=load(path / "complexities.npy", mmap_mode="r"),
+            lightcone_depth=metadata["lightcone_depth"],
+        )
+
+    def lookup(self, keys: ndarray, unseen_complexity: float) -> ndarray:
+        if not len(self.keys):
+            return full(keys.shape, unseen_complexity, dtype="float64")
+        indices = searchsorted(self.keys, keys).clip(max=len(self.keys) - 1)
+        return where(
+            self.keys[indices] == keys, self.complexities[indices], unseen_complexity
+        )
+
+
 def local_statistical_complexity_filter(
     spacetime: ndarray,
-    past_lightcone_to_statistical_complexity: dict[str, float],
+    past_lightcone_to_statistical_complexity: Union[
+        dict[int, float], StatisticalComplexityModel
+    ],
     lightcone_depth: int,
+    unseen_complexity: float = float("-inf"),
 ) -> ndarray:
-    filtered_spacetime = zeros_like(spacetime, dtype="float64")
-    max_time, max_space = spacetime.shape
-    for t in range(max_time):
-        for x in range(max_space):
-            past_lightcone_repr = "".join(
-                map(
-                    str,
-                    cell_values(
-                        spacetime=spacetime,
-                        coordinates=coordinates_lightcone(
-                            x=x,
-                            t=t,
-                            max_space=max_space,
-                            max_time=max_time,
-                            lightcone_depth=-lightcone_depth,
-                            allow_partial_cones=True,
-                        ),
-                    ),
-                )
-            )
-            filtered_spacetime[t, x] = past_lightcone_to_statistical_complexity.get(
-                past_lightcone_repr, float("-inf")
-            )
-    return filtered_spacetime
+    if (
+        isinstance(past_lightcone_to_statistical_complexity, StatisticalComplexityModel)
+        and past_lightcone_to_statistical_complexity.lightcone_depth != lightcone_depth
+    ):
+        raise ValueError(
+            f"the model was trained on light cones of depth {past_lightcone_to_statistical_complexity.lightcone_depth}, not {lightcone_depth}"
+        )
+    past_keys = past_lightcone_keys(
+        spacetime=spacetime, lightcone_depth=lightcone_depth
+    )
+    if isinstance(past_lightcone_to_statistical_complexity, StatisticalComplexityModel):
+        return past_lightcone_to_statistical_complexity.lookup(
+            keys=past_keys, unseen_complexity=unseen_complexity
+        )
+    unique_keys, inverse = unique(past_keys, return_inverse=True)
+    complexities = array(
+        [
+            past_lightcone_to_statistical_complexity.get(key, unseen_complexity)
+            for key in unique_keys.tolist()
+        ],
+        dtype="float64",
+    )
+    return complexities[inverse.reshape(past_keys.shape)]
 
 
-from cv2 import THRESH_BINARY, THRESH_OTSU, cvtColor, threshold
-from eca import OneDimensionalElementaryCellularAutomata
-from matplotlib.pyplot import imshow, show
+def spacetime(lattice_width: int, time: int, rule_number: int) -> ndarray:
+    return elementary_spacetime(
+        width=lattice_width, n_steps=time, rule_number=rule_number
+    )
 
 
-def spacetime(lattice_width: int, time: int, rule_number: int) -> ndarray:
-    ca = OneDimensionalElementaryCellularAutomata(lattice_width=lattice_width)
-    for _ in range(time):
-        ca.transition(rule_number)
-    return ca.evolution()
-
-
-n_spacetimes = 1
-lightcone_depth = 5
-similarity_theta = 0.05
-lattice_width = 100
-time = 100
-rule_number = 110
-# sts = [spacetime(lattice_width=lattice_width,time=time, rule_number=rule_number) for _ in range(n_spacetimes)]
-st = spacetime(lattice_width=lattice_width, time=time, rule_number=rule_number)
-sts = [st]
-past_lightcone_to_statistical_complexity = statistical_complexity(
-    spacetimes=sts,
-    lightcone_depth=lightcone_depth,
-    causal_state_clustering_similarity_threshold=similarity_theta,
-)
-filtered_spacetime = local_statistical_complexity_filter(
-    spacetime=st,
-    past_lightcone_to_statistical_complexity=past_lightcone_to_statistical_complexity,
-    lightcone_depth=lightcone_depth,
-)
-imshow(filtered_spacetime)
-show()
+if __name__ == "__main__":
+    from matplotlib.pyplot import imshow, show
+
+    n_spacetimes = 1
+    lightcone_depth = 5
+    similarity_theta = 0.05
+    lattice_width = 100
+    time = 100
+    rule_number = 110
+    # sts = [spacetime(lattice_width=lattice_width,time=time, rule_number=rule_number) for _ in range(n_spacetimes)]
+    st = spacetime(lattice_width=lattice_width, time=time, rule_number=rule_number)
+    sts = [st]
+    past_lightcone_to_statistical_complexity = statistical_complexity(
+        spacetimes=sts,
+        lightcone_depth=lightcone_depth,
+        causal_state_clustering_similarity_threshold=similarity_theta,
+    )
+    filtered_spacetime = local_statistical_complexity_filter(
+        spacetime=st,
+        past_lightcone_to_statistical_complexity=past_lightcone_to_statistical_complexity,
+        lightcone_depth=lightcone_depth,
+    )
+    imshow(filtered_spacetime)
+    show()
 
 # TODO: visualise the location of the same past light cone with two different future light cones
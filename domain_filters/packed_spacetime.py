@@ -0,0 +1,76 @@
+from typing import Optional
+
+from numpy import asarray, ndarray, packbits, uint8, unpackbits
+
+try:
+    from numpy import bitwise_count
+except ImportError:
+    bitwise_count = None
+
+
+class PackedSpacetime:
+    """A binary spacetime stored as bits (8 cells per byte along each row)"""
+
+    def __init__(self, bits: ndarray, width: int) -> None:
+        self._bits = bits
+        self._width = width
+
+    @classmethod
+    def from_dense(cls, spacetime: ndarray) -> "PackedSpacetime":
+        spacetime = asarray(spacetime)
+        return cls(bits=packbits(spacetime != 0, axis=1), width=spacetime.shape[1])
+
+    @property
+    def bits(self) -> ndarray:
+        return self._bits
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return self._bits.shape[0], self._width
+
+    @property
+    def nbytes(self) -> int:
+        return self._bits.nbytes
+
+    def __len__(self) -> int:
+        return self._bits.shape[0]
+
+    def __array__(self, dtype=None, copy: Optional[bool] = None) -> ndarray:
+        if copy is False:
+            raise ValueError("unpacking a PackedSpacetime always copies")
+        return self.to_dense(dtype=uint8 if dtype is None else dtype)
+
+    def to_dense(self, dtype=uint8) -> ndarray:
+        """Unpack into one byte (or the given dtype) per cell"""
+        return unpackbits(self._bits, axis=1, count=self._width).astype(
+            dtype, copy=False
+        )
+
+    def rows(self, start: int, stop: int) -> "PackedSpacetime":
+        """A view (no copy) of the rows between start and stop"""
+        return PackedSpacetime(bits=self._bits[start:stop], width=self._width)
+
+    def row(self, t: int) -> ndarray:
+        return unpackbits(self._bits[t], count=self._width)
+
+    def window(self, t: int, x: int, height: int, width: int) -> ndarray:
+        """Unpack only the bytes covering the requested window"""
+        first_byte, last_byte = x // 8, (x + width + 7) // 8
+        block = unpackbits(self._bits[t : t + height, first_byte:last_byte], axis=1)
+        offset = x - 8 * first_byte
+        return block[:, offset : offset + width]
+
+    def row_differences(self, other: "PackedSpacetime") -> ndarray:
+        """Number of differing cells in each row (XOR then popcount)"""
+        difference = self._bits ^ other.bits
+        if bitwise_count is None:
+            return unpackbits(difference, axis=1).sum(axis=1)
+        return bitwise_count(difference).sum(axis=1, dtype="int64")
+
+    def equal_rows(self, other: "PackedSpacetime") -> ndarray:
+        return ~(self._bits ^ other.bits).any(axis=1)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, PackedSpacetime):
+            return NotImplemented
+        return self.shape == other.shape and bool(self.equal_rows(other=other).all())
@@ -0,0 +1,193 @@
+from collections import OrderedDict
+from hashlib import sha256
+from json import dumps, loads
+from os import getpid, replace
+from pathlib import Path
+from threading import Lock, get_ident
+from typing import Any, Callable, Optional, Union
+
+from numpy import asarray, dtype, load, ndarray, savez, savez_compressed
+
+from domain_filters.packed_spacetime import PackedSpacetime
+
+
+def result_key(
+    rule: int,
+    width: int,
+    height: int,
+    name: str,
+    seed: Optional[int] = None,
+    **parameters: Any,
+) -> str:
+    """A content address for a result from everything that determines it (including the seed of a random initial configuration, when there is one)"""
+    description = {
+        "rule": rule,
+        "width": width,
+        "height": height,
+        "filter": name,
+        "parameters": parameters,
+    }
+    if seed is not None:
+        description["seed"] = seed
+    description = dumps(description, sort_keys=True)
+    return sha256(description.encode("utf-8")).hexdigest()
+
+
+def is_binary(result: ndarray) -> bool:
+    return result.dtype.kind in "biuf" and bool(((result == 0) | (result == 1)).all())
+
+
+class _Entry:
+    """A cached result, bit-packed when it only holds zeros and ones"""
+
+    def __init__(
+        self,
+        dtype: dtype,
+        shape: tuple[int, ...],
+        packed: Optional[PackedSpacetime] = None,
+        dense: Optional[ndarray] = None,
+        metadata: Optional[dict[str, Any]] = None,
+    ) -> None:
+        self.dtype = dtype
+        self.shape = shape
+        self.packed = packed
+        self.dense = dense
+        self.metadata = metadata or {}
+
+    @classmethod
+    def from_result(cls, result: ndarray, metadata: dict[str, Any]) -> "_Entry":
+        if result.ndim == 2 and is_binary(result=result):
+            return cls(
+                dtype=result.dtype,
+                shape=result.shape,
+                packed=PackedSpacetime.from_dense(result),
+                metadata=metadata,
+            )
+        dense = result.copy()
+        dense.flags.writeable = False
+        return cls(
+            dtype=result.dtype, shape=result.shape, dense=dense, metadata=metadata
+        )
+
+    @property
+    def nbytes(self) -> int:
+        return self.dense.nbytes if self.packed is None else self.packed.nbytes
+
+    def result(self) -> ndarray:
+        if self.packed is None:
+            return self.dense
+        return self.packed.to_dense(dtype=self.dtype)
+
+
+class ResultCache:
+    """Least recently used results held up to a memory budget, with an optional directory every result is also written to (compressed, if asked)"""
+
+    def __init__(
+        self,
+        max_bytes: int = 2**28,
+        directory: Optional[Union[str, Path]] = None,
+        compressed: bool = False,
+    ) -> None:
+        self._max_bytes = max_bytes
+        self._directory = None if directory is None else Path(directory)
+        self._compressed = compressed
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        self._nbytes = 0
+        self._lock = Lock()
+
+    @property
+    def nbytes(self) -> int:
+        return self._nbytes
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries or (
+            self._directory is not None and self._path(key=key).exists()
+        )
+
+    def _path(self, key: str) -> Path:
+        return self._directory / f"{key}.npz"
+
+    def _insert(self, key: str, entry: _Entry) -> None:
+        with self._lock:
+            if key in self._entries:
+                self._nbytes -= self._entries.pop(key).nbytes
+            if entry.nbytes > self._max_bytes:
+                return
+            self._entries[key] = entry
+            self._nbytes += entry.nbytes
+            while self._nbytes > self._max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._nbytes -= evicted.nbytes
+
+    def _read(self, key: str) -> Optional[_Entry]:
+        if self._directory is None or not self._path(key=key).exists():
+            return None
+        with load(self._path(key=key)) as stored:
+            result_dtype = dtype(str(stored["dtype"]))
+            shape = tuple(int(length) for length in stored["shape"])
+            metadata = loads(str(stored["metadata"])) if "metadata" in stored else {}
+            if "bits" in stored:
+                return _Entry(
+                    dtype=result_dtype,
+                    shape=shape,
+                    packed=PackedSpacetime(bits=stored["bits"], width=shape[1]),
+                    metadata=metadata,
+                )
+            dense = stored["dense"]
+        dense.flags.writeable = False
+        return _Entry(dtype=result_dtype, shape=shape, dense=dense, metadata=metadata)
+
+    def _write(self, key: str, entry: _Entry) -> None:
+        if self._directory is None:
+            return
+        self._directory.mkdir(parents=True, exist_ok=True)
+        path = self._path(key=key)
+        temporary_path = path.with_suffix(f".{getpid()}.{get_ident()}.tmp.npz")
+        arrays = {
+            "dtype": entry.dtype.str,
+            "shape": asarray(entry.shape),
+            "metadata": dumps(entry.metadata),
+        }
+        if entry.packed is None:
+            arrays["dense"] = entry.dense
+        else:
+            arrays["bits"] = entry.packed.bits
+        (savez_compressed if self._compressed else savez)(temporary_path, **arrays)
+        replace(temporary_path, path)
+
+    def get(self, key: str) -> Optional[ndarray]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        if entry is None:
+            entry = self._read(key=key)
+            if entry is None:
+                return None
+            self._insert(key=key, entry=entry)
+        return entry.result()
+
+    def metadata(self, key: str) -> Optional[dict[str, Any]]:
+        """What was stored alongside the result (such as how long it took), or None if it is not cached"""
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            entry = self._read(key=key)
+        return None if entry is None else entry.metadata
+
+    def put(self, key: str, result: ndarray, **metadata: Any) -> ndarray:
+        """Cache the result (with any JSON-serialisable metadata) and return it as the cache will serve it"""
+        entry = _Entry.from_result(result=asarray(result), metadata=metadata)
+        self._insert(key=key, entry=entry)
+        self._write(key=key, entry=entry)
+        return entry.result()
+
+    def get_or_compute(self, key: str, compute: Callable[[], ndarray]) -> ndarray:
+        """The cached result for the key, computing (and caching) it on a miss"""
+        result = self.get(key=key)
+        if result is None:
+            result = self.put(key=key, result=compute())
+        return result
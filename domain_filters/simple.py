@@ -1,18 +1,55 @@
-from typing import List
+from typing import List, Union
 
-from numpy import array, ndarray
+from numpy import array, asarray, cumsum, ndarray, pad, roll, zeros
 
 
 class SimpleDomainFilter:
-    def __init__(self, min_radius: int = 1, max_radius: int = 15) -> None:
+    def __init__(
+        self, min_radius: int = 1, max_radius: int = 15, vectorised: bool = True
+    ) -> None:
         self._min_radius = min_radius
         self._max_radius = max_radius
+        self._vectorised = vectorised
 
-    def classify_spacetime(self, spacetime: List[List[int]]) -> List[List[bool]]:
+    def classify_spacetime(
+        self, spacetime: List[List[int]]
+    ) -> Union[ndarray, List[List[bool]]]:
+        spacetime = asarray(spacetime)
+        if self._vectorised:
+            return self.classify_spacetime_vectorised(spacetime=spacetime)
         return list(
             map(lambda lattice: self.classify_lattice(lattice=lattice), spacetime)
         )
 
+    def classify_spacetime_vectorised(self, spacetime: ndarray) -> ndarray:
+        """Compare the left and right neighbourhoods of every cell for all radii at once using shifted copies of the spacetime"""
+        height, width = spacetime.shape
+        classified = zeros((height, width), dtype=bool)
+        for radius in range(self._min_radius, self._max_radius):
+            if classified.all():
+                break
+            if radius >= width:
+                classified |= array(
+                    [
+                        [
+                            self._equal_neighbours(
+                                index=index, lattice=lattice, radius=radius
+                            )
+                            for index in range(width)
+                        ]
+                        for lattice in spacetime
+                    ],
+                    dtype=bool,
+                )
+                continue
+            mismatches = spacetime != roll(spacetime, -radius, axis=1)
+            cumulative_mismatches = pad(cumsum(mismatches, axis=1), ((0, 0), (1, 0)))
+            classified[:, radius:] |= (
+                cumulative_mismatches[:, radius + 1 :]
+                == cumulative_mismatches[:, : width - radius]
+            )
+        return classified
+
     def classify_lattice(self, lattice: List[int]) -> List[bool]:
         return list(
             map(
@@ -0,0 +1,45 @@
+from collections import deque
+from typing import Any, Iterable, Iterator
+
+from numpy import asarray, ndarray, stack
+
+from domain_filters import FILTERS, get_filter
+from domain_filters.tiling import filter_row_halo
+
+
+def stream_filter(
+    name: str, rows: Iterable[ndarray], chunk_rows: int = 1, **parameters: Any
+) -> Iterator[ndarray]:
+    """Filter a spacetime row by row, yielding each filtered row as soon as it is determined"""
+    spec = FILTERS[name]
+    if not spec.tileable:
+        raise ValueError(f"{name} learns from the whole spacetime and cannot stream")
+    filter_ = get_filter(name=name)
+    rows_before = filter_row_halo(name=name, parameters=parameters)
+    rows_after = 0 if spec.causal else rows_before
+    history = deque(maxlen=rows_before + chunk_rows + rows_after)
+    n_rows_seen, n_rows_emitted = 0, 0
+
+    def emit(stop: int, n_rows_available: int) -> Iterator[ndarray]:
+        first_row_in_history = n_rows_seen - len(history)
+        start = max(first_row_in_history, n_rows_emitted - rows_before)
+        block = stack(
+            [
+                history[index - first_row_in_history]
+                for index in range(start, n_rows_available)
+            ]
+        )
+        filtered_block = asarray(filter_(block, **parameters))
+        yield from filtered_block[n_rows_emitted - start : stop - start]
+
+    for row in rows:
+        history.append(asarray(row))
+        n_rows_seen += 1
+        if n_rows_seen - n_rows_emitted >= chunk_rows + rows_after:
+            stop = n_rows_emitted + chunk_rows
+            yield from emit(stop=stop, n_rows_available=stop + rows_after)
+            n_rows_emitted = stop
+    while n_rows_emitted < n_rows_seen:
+        stop = min(n_rows_emitted + chunk_rows, n_rows_seen)
+        yield from emit(stop=stop, n_rows_available=n_rows_seen)
+        n_rows_emitted = stop
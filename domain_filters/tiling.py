@@ -0,0 +1,269 @@
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Executor,
+    Future,
+    ProcessPoolExecutor,
+    wait,
+)
+from functools import partial
+from importlib import import_module
+from inspect import signature
+from math import ceil
+from os import cpu_count
+from threading import Lock
+from typing import Any, Iterator, Optional, Union
+
+from numpy import asarray, empty, ndarray, zeros
+
+from domain_filters import FILTERS, get_filter, run_filter
+from domain_filters.packed_spacetime import PackedSpacetime
+
+PREVIEW_BANDS = 16
+
+
+def filter_halo(name: str, parameters: dict[str, Any]) -> int:
+    """How many columns (and, unless it has a vertical footprint, rows) beyond a tile the named filter reads (from its footprint parameter, falling back to the implementation's default)"""
+    spec = FILTERS[name]
+    if spec.footprint_parameter is None:
+        return 0
+    if spec.footprint_parameter in parameters:
+        footprint = parameters[spec.footprint_parameter]
+    else:
+        implementation = getattr(import_module(spec.module), spec.attribute)
+        if isinstance(implementation, type):
+            implementation = implementation.__init__
+        footprint = signature(implementation).parameters[spec.footprint_parameter]
+        footprint = footprint.default
+    return footprint + spec.footprint_offset
+
+
+def filter_row_halo(name: str, parameters: dict[str, Any]) -> int:
+    """How many rows above and below a tile the named filter reads"""
+    vertical_footprint = FILTERS[name].vertical_footprint
+    if vertical_footprint is None:
+        return filter_halo(name=name, parameters=parameters)
+    return vertical_footprint
+
+
+def _bounds(length: int, tile_length: int) -> list[tuple[int, int]]:
+    return [
+        (start, min(start + tile_length, length))
+        for start in range(0, length, tile_length)
+    ]
+
+
+def _tile(
+    spacetime: Union[ndarray, PackedSpacetime],
+    rows: tuple[int, int],
+    columns: tuple[int, int],
+) -> ndarray:
+    (row_start, row_stop), (column_start, column_stop) = rows, columns
+    if isinstance(spacetime, PackedSpacetime):
+        return spacetime.window(
+            t=row_start,
+            x=column_start,
+            height=row_stop - row_start,
+            width=column_stop - column_start,
+        )
+    return spacetime[row_start:row_stop, column_start:column_stop]
+
+
+def tiles(
+    name: str,
+    spacetime: Union[ndarray, PackedSpacetime],
+    tile_shape: tuple[int, int],
+    parameters: dict[str, Any],
+) -> Iterator[tuple[tuple[int, int, int, int], tuple[int, int], ndarray]]:
+    """Yield (output bounds, offset of the bounds within the tile, tile with halo) for every tile (filters that wrap around the lattice are only split into row bands)"""
+    height, width = spacetime.shape
+    halo = filter_halo(name=name, parameters=parameters)
+    row_halo = filter_row_halo(name=name, parameters=parameters)
+    column_bounds = [(0, width)]
+    if not FILTERS[name].periodic:
+        column_bounds = _bounds(length=width, tile_length=tile_shape[1])
+    for row_start, row_stop in _bounds(length=height, tile_length=tile_shape[0]):
+        halo_row_start = max(0, row_start - row_halo)
+        halo_row_stop = min(height, row_stop + row_halo)
+        for column_start, column_stop in column_bounds:
+            columns = (max(0, column_start - halo), min(width, column_stop + halo))
+            column_offset = column_start - columns[0]
+            yield (
+                (row_start, row_stop, column_start, column_stop),
+                (row_start - halo_row_start, column_offset),
+                _tile(
+                    spacetime=spacetime,
+                    rows=(halo_row_start, halo_row_stop),
+                    columns=columns,
+                ),
+            )
+
+
+def _run_tile(name: str, tile: ndarray, parameters: dict[str, Any]) -> ndarray:
+    return asarray(get_filter(name=name)(tile, **parameters))
+
+
+def stitch_tile(
+    filtered_spacetime: ndarray,
+    bounds: tuple[int, int, int, int],
+    offset: tuple[int, int],
+    result: ndarray,
+) -> None:
+    """Copy the interior of a filtered tile into its place in the whole filtered spacetime"""
+    row_start, row_stop, column_start, column_stop = bounds
+    row_offset, column_offset = offset
+    filtered_spacetime[row_start:row_stop, column_start:column_stop] = result[
+        row_offset : row_offset + row_stop - row_start,
+        column_offset : column_offset + column_stop - column_start,
+    ]
+
+
+def run_tiled(
+    name: str,
+    spacetime: Union[ndarray, PackedSpacetime],
+    n_workers: Optional[int] = None,
+    tile_shape: Optional[tuple[int, int]] = None,
+    **parameters: Any,
+) -> ndarray:
+    """Run the named filter over halo-padded tiles in a process pool and stitch the tile interiors together (identical to running it on the whole spacetime)"""
+    if not isinstance(spacetime, PackedSpacetime):
+        spacetime = asarray(spacetime)
+    if not FILTERS[name].tileable:
+        return asarray(run_filter(name, spacetime, **parameters))
+    n_workers = n_workers or cpu_count()
+    height, width = spacetime.shape
+    tile_shape = tile_shape or (max(1, ceil(height / n_workers)), width)
+    filtered_spacetime = None
+
+    def stitch(
+        bounds: tuple[int, int, int, int], offset: tuple[int, int], result: ndarray
+    ) -> None:
+        nonlocal filtered_spacetime
+        if filtered_spacetime is None:
+            filtered_spacetime = empty((height, width), dtype=result.dtype)
+        stitch_tile(filtered_spacetime, bounds, offset, result)
+
+    all_tiles = tiles(
+        name=name, spacetime=spacetime, tile_shape=tile_shape, parameters=parameters
+    )
+    if n_workers == 1:
+        for bounds, offset, tile in all_tiles:
+            stitch(bounds, offset, _run_tile(name, tile, parameters))
+        return filtered_spacetime
+
+    with ProcessPoolExecutor(max_workers=n_workers) as pool:
+        pending = {}
+        for bounds, offset, tile in all_tiles:
+            if len(pending) >= 2 * n_workers:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stitch(*pending.pop(future), future.result())
+            pending[pool.submit(_run_tile, name, tile, parameters)] = (bounds, offset)
+        for future in list(pending):
+            stitch(*pending.pop(future), future.result())
+    return filtered_spacetime
+
+
+class FilterJob:
+    """A filter run submitted as halo-padded row bands, stitched together as they finish so partial results can be shown (and stale runs cancelled) before it completes"""
+
+    def __init__(
+        self,
+        name: str,
+        spacetime: Union[ndarray, PackedSpacetime],
+        executor: Executor,
+        band_rows: int,
+        parameters: dict[str, Any],
+    ) -> None:
+        if not isinstance(spacetime, PackedSpacetime):
+            spacetime = asarray(spacetime)
+        self.shape = spacetime.shape
+        self._filtered_spacetime = None
+        self._finished_rows = zeros(self.shape[0], dtype=bool)
+        self._lock = Lock()
+        self._bands = []
+        self._stitched = set()
+        if FILTERS[name].tileable:
+            all_tiles = tiles(
+                name=name,
+                spacetime=spacetime,
+                tile_shape=(band_rows, self.shape[1]),
+                parameters=parameters,
+            )
+        else:
+            all_tiles = [((0, self.shape[0], 0, self.shape[1]), (0, 0), spacetime)]
+        for index, (bounds, offset, tile) in enumerate(all_tiles):
+            future = executor.submit(_run_tile, name, tile, parameters)
+            self._bands.append((bounds, offset, future))
+            future.add_done_callback(partial(self._stitch, index))
+
+    @property
+    def _futures(self) -> list[Future]:
+        return [future for _, _, future in self._bands]
+
+    def _stitch(self, index: int, future: Future) -> None:
+        if future.cancelled() or future.exception() is not None:
+            return
+        bounds, offset, _ = self._bands[index]
+        result = future.result()
+        with self._lock:
+            if index in self._stitched:
+                return
+            if self._filtered_spacetime is None:
+                self._filtered_spacetime = zeros(self.shape, dtype=result.dtype)
+            stitch_tile(self._filtered_spacetime, bounds, offset, result)
+            self._finished_rows[bounds[0] : bounds[1]] = True
+            self._stitched.add(index)
+
+    def cancel(self) -> None:
+        """Drop every band that has not started (bands already running finish, but nothing waits for them)"""
+        for future in self._futures:
+            future.cancel()
+
+    def done(self) -> bool:
+        return all(future.done() for future in self._futures)
+
+    @property
+    def finished_rows(self) -> ndarray:
+        """Which rows of the filtered spacetime are final"""
+        with self._lock:
+            return self._finished_rows.copy()
+
+    @property
+    def progress(self) -> float:
+        return float(self._finished_rows.mean())
+
+    def preview(self) -> Optional[ndarray]:
+        """A copy of the filtered spacetime so far (rows of unfinished bands are zero), or None before any band finishes"""
+        with self._lock:
+            if self._filtered_spacetime is None:
+                return None
+            return self._filtered_spacetime.copy()
+
+    def result(self, timeout: Optional[float] = None) -> ndarray:
+        """Wait for every band (raising the first error or CancelledError) and return the whole filtered spacetime"""
+        for index, future in enumerate(self._futures):
+            future.result(timeout=timeout)
+            self._stitch(index, future)
+        return self._filtered_spacetime
+
+
+def submit_tiled(
+    name: str,
+    spacetime: Union[ndarray, PackedSpacetime],
+    executor: Executor,
+    band_rows: Optional[int] = None,
+    **parameters: Any,
+) -> FilterJob:
+    """Start the named filter in the background, one row band per task"""
+    band_rows = band_rows or max(
+        1,
+        ceil(len(spacetime) / PREVIEW_BANDS),
+        filter_row_halo(name=name, parameters=parameters),
+    )
+    return FilterJob(
+        name=name,
+        spacetime=spacetime,
+        executor=executor,
+        band_rows=band_rows,
+        parameters=parameters,
+    )
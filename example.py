@@ -1,8 +1,8 @@
 from argparse import ArgumentParser
 
-from eca import OneDimensionalElementaryCellularAutomata
 from matplotlib.pyplot import show, subplots
 
+from domain_filters.automata import spacetime as elementary_spacetime
 from domain_filters.contours_via_circles import detect_contours
 from domain_filters.lftsf import LocalisedFourierTransformSelfFilter
 from domain_filters.simple import SimpleDomainFilter
@@ -17,13 +17,12 @@ if __name__ == "__main__":
 
     simple_domain_filter = SimpleDomainFilter()
     lftsf_domain_filter = LocalisedFourierTransformSelfFilter()
-    ca = OneDimensionalElementaryCellularAutomata(
-        lattice_width=arguments.width, initial_configuration=arguments.ic
+    spacetime = elementary_spacetime(
+        width=arguments.width,
+        n_steps=arguments.height,
+        rule_number=arguments.rule,
+        configuration=arguments.ic,
     )
-    for _ in range(arguments.height):
-        ca.transition(rule_number=arguments.rule)
-
-    spacetime = ca.evolution()
     filtered_spacetime1 = simple_domain_filter.classify_spacetime(spacetime=spacetime)
     filtered_spacetime2 = lftsf_domain_filter.classify_spacetime(spacetime=spacetime)
     filtered_spacetime3 = detect_contours(
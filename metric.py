@@ -1,26 +1,111 @@
-from hilbert import decode
-from numpy import ndarray, pad
-from scipy.spatial.distance import cosine
+from functools import lru_cache
+from math import ceil, log2
+from typing import Optional, Sequence
 
+from numpy import arange, asarray, clip, concatenate, errstate, ndarray, stack
 
-def hilbert_flatten(matrix: ndarray, n_iterations: int = 8) -> ndarray:
-    """flatten 2d matrix into 1d vector using Hilbert Curve"""
-    h, w = matrix.shape
-    length = max(h, w)
-    y_pad, x_pad = length - h, length - w
-    matrix_padded = pad(
-        matrix, ((0, y_pad), (0, x_pad)), mode="constant", constant_values=0
-    )
+
+@lru_cache(maxsize=32)
+def hilbert_index(
+    shape: tuple[int, int], n_iterations: Optional[int] = None
+) -> tuple[ndarray, ndarray]:
+    """Row and column of every cell of a matrix with the given shape, in Hilbert Curve order"""
+    from hilbert import decode
+
+    h, w = shape
+    if n_iterations is None:
+        n_iterations = max(1, ceil(log2(max(1, min(h, w)))))
+    side = 2**n_iterations
+    if side < min(h, w):
+        raise ValueError(
+            f"{n_iterations} iterations cover {side} of the {min(h, w)} cells "
+            "along the shorter side"
+        )
     matrix_dimensions = 2
-    coordinates = tuple(
-        decode(range(h * w), matrix_dimensions, n_iterations).T.tolist()
+    square_rows, square_columns = decode(
+        arange(4**n_iterations), matrix_dimensions, n_iterations
+    ).T
+    if h > w:
+        square_rows, square_columns = square_columns, square_rows
+    rows, columns = [], []
+    for offset in range(0, max(h, w), side):
+        tile_rows, tile_columns = square_rows, square_columns + offset
+        if h > w:
+            tile_rows, tile_columns = square_rows + offset, square_columns
+        inside = (tile_rows < h) & (tile_columns < w)
+        rows.append(tile_rows[inside])
+        columns.append(tile_columns[inside])
+    rows, columns = concatenate(rows), concatenate(columns)
+    rows.flags.writeable = False
+    columns.flags.writeable = False
+    return rows, columns
+
+
+def hilbert_flatten(matrix: ndarray, n_iterations: Optional[int] = None) -> ndarray:
+    """flatten 2d matrix into 1d vector using Hilbert Curve"""
+    matrix = asarray(matrix)
+    return matrix[hilbert_index(shape=matrix.shape, n_iterations=n_iterations)]
+
+
+def get_scores(predictions: Sequence[ndarray], expected: ndarray) -> list[float]:
+    """Score every prediction against the same expected matrix in one pass"""
+    expected_vector = asarray(expected, dtype="float64").reshape(-1)
+    predicted_vectors = stack(
+        [asarray(predicted, dtype="float64").reshape(-1) for predicted in predictions]
     )
-    return matrix_padded[coordinates]
+    with errstate(divide="ignore", invalid="ignore"):
+        similarities = (predicted_vectors @ expected_vector) / (
+            (predicted_vectors**2).sum(axis=1) * (expected_vector @ expected_vector)
+        ) ** 0.5
+    distances = clip(1 - similarities, 0.0, 2.0)
+    return (1 - distances).tolist()
 
 
 def get_score(predicted: ndarray, expected: ndarray) -> float:
-    predicted_vector = hilbert_flatten(matrix=predicted)
-    expected_vector = hilbert_flatten(matrix=expected)
+    return get_scores(predictions=[predicted], expected=expected)[0]
+
+
+def _ratio(numerator: float, denominator: float) -> float:
+    return numerator / denominator if denominator else float("nan")
+
 
-    distance = cosine(predicted_vector, expected_vector)
-    return 1 - distance
+def evaluate(
+    predicted: ndarray,
+    expected: ndarray,
+    threshold: float = 0.5,
+    chunk_rows: int = 1024,
+) -> dict[str, float]:
+    """Cosine score, IoU, precision, recall, F1 and pixel accuracy in one pass over row chunks"""
+    if not isinstance(predicted, ndarray):
+        predicted = asarray(predicted)
+    if not isinstance(expected, ndarray):
+        expected = asarray(expected)
+    dot = predicted_squared = expected_squared = 0.0
+    true_positives = false_positives = false_negatives = 0
+    for start in range(0, len(expected), chunk_rows):
+        predicted_chunk = predicted[start : start + chunk_rows].astype("float64")
+        expected_chunk = expected[start : start + chunk_rows].astype("float64")
+        dot += float((predicted_chunk * expected_chunk).sum())
+        predicted_squared += float((predicted_chunk**2).sum())
+        expected_squared += float((expected_chunk**2).sum())
+        predicted_mask = predicted_chunk > threshold
+        expected_mask = expected_chunk > threshold
+        true_positives += int((predicted_mask & expected_mask).sum())
+        false_positives += int((predicted_mask & ~expected_mask).sum())
+        false_negatives += int((~predicted_mask & expected_mask).sum())
+    n_cells = expected.size
+    precision = _ratio(true_positives, true_positives + false_positives)
+    recall = _ratio(true_positives, true_positives + false_negatives)
+    cosine_similarity = _ratio(dot, (predicted_squared * expected_squared) ** 0.5)
+    return {
+        "cosine": 1 - min(max(1 - cosine_similarity, 0.0), 2.0),
+        "iou": _ratio(
+            true_positives, true_positives + false_positives + false_negatives
+        ),
+        "precision": precision,
+        "recall": recall,
+        "f1": _ratio(
+            2 * true_positives, 2 * true_positives + false_positives + false_negatives
+        ),
+        "accuracy": _ratio(n_cells - false_positives - false_negatives, n_cells),
+    }
@@ -0,0 +1,114 @@
+from argparse import ArgumentParser
+from json import dumps, loads
+from pathlib import Path
+from typing import Any, Optional, Union
+
+from numpy import array, load, min_scalar_type, ndarray, promote_types, save
+
+from domain_filters.packed_spacetime import PackedSpacetime
+from synthesis import UNFILLED, string_to_array, synthesise_spacetime
+
+
+class Sample:
+    """A test sample stored as a directory of bit-packed spacetime, defects and (when some cells lie outside every domain) unfilled cells, smallest-integer domain labels and JSON metadata"""
+
+    def __init__(
+        self,
+        spacetime: PackedSpacetime,
+        defects: PackedSpacetime,
+        domains: ndarray,
+        metadata: dict[str, Any],
+        unfilled: Optional[PackedSpacetime] = None,
+    ) -> None:
+        self.spacetime = spacetime
+        self.defects = defects
+        self.domains = domains
+        self.metadata = metadata
+        self.unfilled = unfilled
+
+    @classmethod
+    def from_json(cls, path: Union[str, Path]) -> "Sample":
+        data = loads(Path(path).read_text())
+        metadata = data["metadata"]
+        domains = array(data["domain_regions"], dtype=int)
+        spacetime = synthesise_spacetime(
+            domain_regions=domains,
+            pattern_signatures=[
+                domain["pattern_signature"].split("-") for domain in metadata["domains"]
+            ],
+        )
+        unfilled = spacetime == UNFILLED
+        defects = string_to_array(
+            image=data["annotated_defects"],
+            shape=(metadata["time"], metadata["lattice_width"]),
+        )
+        return cls(
+            spacetime=PackedSpacetime.from_dense(spacetime == 1),
+            defects=PackedSpacetime.from_dense(defects),
+            domains=domains.astype(
+                promote_types(
+                    min_scalar_type(domains.min()), min_scalar_type(domains.max())
+                )
+            ),
+            metadata=metadata,
+            unfilled=PackedSpacetime.from_dense(unfilled) if unfilled.any() else None,
+        )
+
+    def save(self, path: Union[str, Path]) -> None:
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        save(path / "spacetime.npy", self.spacetime.bits)
+        save(path / "defects.npy", self.defects.bits)
+        save(path / "domains.npy", self.domains)
+        if self.unfilled is not None:
+            save(path / "unfilled.npy", self.unfilled.bits)
+        (path / "metadata.json").write_text(dumps(self.metadata))
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> "Sample":
+        """Memory-map the arrays read-only (nothing is decoded until a cell is read)"""
+        path = Path(path)
+        metadata = loads((path / "metadata.json").read_text())
+        width = metadata["lattice_width"]
+        unfilled = None
+        if (path / "unfilled.npy").exists():
+            unfilled = PackedSpacetime(
+                bits=load(path / "unfilled.npy", mmap_mode="r"), width=width
+            )
+        return cls(
+            spacetime=PackedSpacetime(
+                bits=load(path / "spacetime.npy", mmap_mode="r"), width=width
+            ),
+            defects=PackedSpacetime(
+                bits=load(path / "defects.npy", mmap_mode="r"), width=width
+            ),
+            domains=load(path / "domains.npy", mmap_mode="r"),
+            metadata=metadata,
+            unfilled=unfilled,
+        )
+
+
+def load_sample(path: Union[str, Path]) -> tuple[ndarray, ndarray]:
+    """Spacetime (UNFILLED outside every domain) and expected domains (1 inside a domain, 0 on a defect) of a JSON sample or a converted sample directory"""
+    if Path(path).is_dir():
+        sample = Sample.load(path=path)
+    else:
+        sample = Sample.from_json(path=path)
+    spacetime = sample.spacetime.to_dense(dtype="int8")
+    if sample.unfilled is not None:
+        spacetime[sample.unfilled.to_dense(dtype=bool)] = UNFILLED
+    return spacetime, 1 - sample.defects.to_dense(dtype=int)
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("paths", type=str, nargs="+")
+    parser.add_argument("--output", type=str, default=None)
+    arguments = parser.parse_args()
+
+    for path in map(Path, arguments.paths):
+        output = path.with_suffix("")
+        if arguments.output is not None:
+            output = Path(arguments.output) / path.stem
+        Sample.from_json(path=path).save(path=output)
+        print(f"{path} -> {output}")
@@ -0,0 +1,80 @@
+from base64 import b64decode
+from math import ceil
+
+from numpy import (
+    arange,
+    asarray,
+    frombuffer,
+    ndarray,
+    stack,
+    take_along_axis,
+    tile,
+    where,
+)
+
+UNFILLED = -1
+
+
+def generate_domain_pattern_from_pattern_signature(
+    width: int,
+    depth: int,
+    pattern_signature: list[str],
+) -> ndarray:
+    """Tile each pattern of the signature across the width and repeat the signature's rows down to the depth"""
+    pattern_rows = stack(
+        [
+            tile(
+                frombuffer(pattern.encode("utf-8"), dtype="uint8") - ord("0"),
+                ceil(width / len(pattern)),
+            )[:width]
+            for pattern in pattern_signature
+        ]
+    ).astype("int8")
+    return pattern_rows[arange(depth) % len(pattern_signature)]
+
+
+def generate_selected_domain_patterns(
+    width: int, depth: int, pattern_signatures: list[list[str]]
+) -> ndarray:
+    return stack(
+        [
+            generate_domain_pattern_from_pattern_signature(
+                width=width,
+                depth=depth,
+                pattern_signature=pattern_signature,
+            )
+            for pattern_signature in pattern_signatures
+        ]
+    )
+
+
+def fill_domains(
+    n_domains: int, segmented_image: ndarray, background_patterns: ndarray
+) -> ndarray:
+    """Take every cell from the background pattern of its domain in one gather (cells outside every domain are UNFILLED)"""
+    segmented_image = asarray(segmented_image)
+    in_domain = (segmented_image >= 0) & (segmented_image < n_domains)
+    labels = where(in_domain, segmented_image, 0).astype("intp")
+    filled_image = take_along_axis(
+        asarray(background_patterns)[:n_domains], labels[None], axis=0
+    )[0]
+    return where(in_domain, filled_image, UNFILLED).astype("int8")
+
+
+def synthesise_spacetime(
+    domain_regions: ndarray, pattern_signatures: list[list[str]]
+) -> ndarray:
+    depth, width = asarray(domain_regions).shape
+    return fill_domains(
+        n_domains=len(pattern_signatures),
+        segmented_image=domain_regions,
+        background_patterns=generate_selected_domain_patterns(
+            width=width, depth=depth, pattern_signatures=pattern_signatures
+        ),
+    )
+
+
+def string_to_array(image: str, shape: tuple[int, int]) -> ndarray:
+    image_bytes = b64decode(image.encode("utf-8"))
+    image_array = frombuffer(image_bytes, dtype=int)
+    return image_array.reshape(shape).astype(bool).astype(int)